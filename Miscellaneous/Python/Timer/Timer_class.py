@@ -1,8 +1,17 @@
+import gc
+import inspect
+import itertools
+import math
+import threading
 import time
 from dataclasses import dataclass, field
-from typing import Any, Callable, ClassVar, Dict, List, Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 import functools
 from contextlib import ContextDecorator
+from contextvars import ContextVar
+from . import Timer_clocks, Timer_memory
+from .Timer_registry import registry
+from .Timer_stats import TimingStats
 
 """
 -This is mostly adapted from code found here: https://realpython.com/python-timer/#a-python-timer-context-manager
@@ -11,11 +20,47 @@ from contextlib import ContextDecorator
  You either have to call the recursive function within a function or
  use Timer as a context manager in a 'with' statement where the body is the function call you want to time
 -For this reason the decorator is best used on a 'main()' function that contains function calls you wish to time
+-RecTimer times just the outermost call of a recursive function, Timer_calltree.CallTree records
+ calls, inclusive and exclusive time for every call path of one or more (recursive) functions
+-Samples are kept as perf_counter_ns() integers in a TimingStats (see Timer_stats.py), which keeps
+ mean/stdev/min/max/percentiles in constant memory. Use .stats to read them.
+-adaptive=True (decorator or .measure()) is for functions too fast to time one call at a time:
+ the cost of an empty timed loop is calibrated and subtracted, 'warmup' untimed calls are made first,
+ the loop count is auto-ranged like timeit.Timer.autorange until one batch takes 'min_batch' seconds,
+ the GC can be switched off with disable_gc, and batches are repeated until the 95% confidence interval
+ of the mean is within 'target_ci' of it or 'budget' seconds have been spent.
+ Every sample is then the time of one call in ns, averaged over its batch. The log line is adaptive_summary():
+ mean ns/call +- the 95% CI half-width, min, loops per batch, batches and the overhead per call subtracted.
+-One Timer can be shared by threads and asyncio tasks: the start time is kept per thread/task in a
+ ContextVar, samples are added under a lock and stop() returns the time of the run it ended. 'async with Timer():' and decorating 'async def'
+ functions time everything that is awaited. Named timers also add every sample (seconds) to the
+ shared Timer_registry.registry, which keeps count, total and max per name.
+-clocks=True reads wall, process CPU and thread CPU time at start and stop (see Timer_clocks.py).
+ The breakdown of the last run is in .last_clocks and is added to the log line, the process CPU,
+ thread CPU and wait (wall minus thread CPU) samples go into .clock_stats, and named timers also
+ record '<name>.process_cpu', '<name>.thread_cpu' and '<name>.wait' in the registry.
+-memory=True also measures tracemalloc peak and net bytes, net allocated blocks and GC collections per
+ generation (see Timer_memory.py). The measuring itself happens outside the timed window, its cost is
+ kept in .memory_stats['overhead_ns'] rather than in .stats. Results go to .last_memory, .memory_stats and,
+ for named timers, '<name>.peak_bytes', '<name>.net_bytes', '<name>.blocks', '<name>.gc0'..'<name>.gc2'
+ and '<name>.memory_overhead' (seconds) in the registry. tracemalloc slows allocations down while it runs,
+ so take timings from runs without memory=True.
+-sink=LogSink(...) (see Timer_sink.py) replaces logger: stop() only queues (name or text, ns, text template) and a
+ background thread formats and writes it, so neither formatting nor the write is part of what is measured.
+-spans=TraceSink(...) (see Timer_trace.py) records a begin and an end event of every run, named after the timer,
+ for a Chrome/Perfetto timeline of nested timers across threads. It works next to logger or sink.
 """
 
 class TimerError(Exception):
     """Custom exception to report errors"""
 
+# Start readings (ns, clocks, memory, whether a span was begun) of the Timers running in the current thread/task, keyed by Timer._key.
+# One ContextVar shared by every Timer: a ContextVar can't be removed from a context once it is set,
+# so one per Timer would grow the context with every throwaway timer. The dict is never changed in place,
+# start() and stop() set a new one, so a task that copied the context keeps its own view.
+_running: ContextVar[Dict[int, Tuple[int, Any, Any, bool]]] = ContextVar("Timer_running", default={})
+_keys = itertools.count()
+
 # ========================================
 # ContextDecorator implementation of Timer
 # ========================================
@@ -26,53 +71,124 @@ class Timer(ContextDecorator):
     logger:        Optional[Callable[[str], None]] = print                       # Logging function, default is print()
     number:        Optional[int]   = 1                                           # Number of times to repeat function execution
     trace:         Optional[bool]  = False                                       # Boolean value, if true then traceback will be printed
-    _time_array:   ClassVar[List[str]] = []                                      # Array of times used when number is greater than 1
-    _start_time:   Optional[float] = field(default=None, init=False, repr=False) # Start time of timer
-    _stop_time:    Optional[float] = field(default=None, init=False, repr=False) # Stop time of timer
-    _elapsed_time: Optional[float] = field(default=0.0, init=False, repr=False)  # Elapsed time of timer
-    
-    def __post_init__(self) -> None:
-        self._time_array = []
+    adaptive:      bool            = False                                       # Use the auto-ranged, overhead-calibrated mode when decorating
+    warmup:        int             = 1                                           # Adaptive: untimed calls before measuring
+    disable_gc:    bool            = False                                       # Adaptive: switch the garbage collector off while measuring
+    min_batch:     float           = 0.02                                        # Adaptive: seconds one timed batch should take at least
+    target_ci:     float           = 0.02                                        # Adaptive: stop when the 95% CI half-width is this fraction of the mean
+    budget:        float           = 1.0                                         # Adaptive: stop after this many seconds regardless
+    min_repeat:    int             = 5                                           # Adaptive: batches measured before the CI is checked
+    clocks:        bool            = False                                       # Also measure process CPU, thread CPU and wait time
+    memory:        bool            = False                                       # Also measure allocations with tracemalloc and GC collections
+    sink:          Optional[Any]   = None                                        # Timer_sink.LogSink that gets every sample instead of logger
+    spans:         Optional[Any]   = None                                        # Timer_trace.TraceSink that gets a begin/end event of every run
+    loops:         int             = field(default=1, init=False, repr=False)    # Adaptive: calls per batch chosen by autorange
+    overhead_ns:   float           = field(default=0.0, init=False, repr=False)  # Adaptive: calibrated cost of an empty batch of 'loops' iterations
+    stats:         TimingStats     = field(default_factory=TimingStats, init=False, repr=False) # Statistics of every sample of this timer
+    clock_stats:   Dict[str, TimingStats] = field(default_factory=dict, init=False, repr=False) # Clocks: 'process', 'thread' and 'wait' statistics in ns
+    last_clocks:   Optional[Timer_clocks.ClockSample] = field(default=None, init=False, repr=False) # Clocks: breakdown of the last run
+    memory_stats:  Dict[str, TimingStats] = field(default_factory=dict, init=False, repr=False) # Memory: statistics per MemorySample field
+    last_memory:   Optional[Timer_memory.MemorySample] = field(default=None, init=False, repr=False) # Memory: measurements of the last run
+    _key:          int             = field(default_factory=_keys.__next__, init=False, repr=False, compare=False) # Key of this timer's start readings in _running
+    _lock:         Any             = field(default_factory=threading.Lock, init=False, repr=False, compare=False) # Guards stats
+    _stop_time:    Optional[int]   = field(default=None, init=False, repr=False) # Stop time of timer in ns
+    _elapsed_time: Optional[float] = field(default=0.0, init=False, repr=False)  # Elapsed time of the last stop() in any thread, informational
     
     def start(self) -> None:
         """Start a new timer"""
         # Check if timer is currently running
-        if self._start_time != None:
+        running = _running.get()
+        if self._key in running:
                 raise TimerError(f"Timer is running, use .stop() to stop it.")
-        # Otherwise start a timer
-        self._start_time = time.perf_counter() 
+        # Otherwise start a timer, the span and memory measuring start first so their cost isn't timed
+        span = self.spans is not None and self.spans.begin(self.name or "Timer")
+        memory = Timer_memory.start() if self.memory else None
+        if self.clocks:
+            readings = Timer_clocks.read()
+            _running.set({**running, self._key: (readings[2], readings, memory, span)})
+        else:
+            _running.set({**running, self._key: (time.perf_counter_ns(), None, memory, span)})
     
     def pause(self) -> None:
         """Pause a timer"""
-        if self._start_time == None:
+        if self._key not in _running.get():
             raise TimerError(f"Timer is not running, use .start() to start it.")
-        self._pause_time = time.perf_counter()
+        self._pause_time = time.perf_counter_ns()
 
     def stop(self) -> float:
         """Stop the timer and calculate the elapsed time"""
         # Check if timer is currently running
-        if self._start_time == None:
+        running = _running.get()
+        entry = running.get(self._key)
+        if entry is None:
             raise TimerError(f"Timer is not running, use .start() to start it.")
-        # Stop timer and calculate elapsed time
-        self._stop_time = time.perf_counter()
-        self._elapsed_time = self._stop_time - self._start_time
-        # Add elapsedtime to array of times
-        f_elapsed = f"{self._elapsed_time:0.6f}"
-        self._time_array.append(f_elapsed)
-        # Reset start time to None
-        self._start_time = None
-        return self._elapsed_time
+        start_time, start_clocks, start_memory, span = entry
+        # Stop timer and calculate elapsed time, everything below uses this call's own numbers
+        sample = None
+        if self.clocks:
+            sample = Timer_clocks.ClockSample.since(start_clocks)
+            elapsed_ns = sample.wall_ns
+            stop_time = start_time + elapsed_ns
+        else:
+            stop_time = time.perf_counter_ns()
+            elapsed_ns = stop_time - start_time
+        elapsed = elapsed_ns / 1e9
+        memory = Timer_memory.stop(start_memory) if self.memory else None
+        if span:
+            self.spans.end(self.name or "Timer")
+        # Remove this timer's entry, the other running timers stay
+        _running.set({key: value for key, value in running.items() if key != self._key})
+        # Add elapsed time to the statistics
+        with self._lock:
+            self.stats.add(elapsed_ns)
+            # Last run of any thread/task, shared, only for inspection
+            self._stop_time = stop_time
+            self._elapsed_time = elapsed
+            if sample is not None:
+                self.last_clocks = sample
+                for clock, ns in (("process", sample.process_ns), ("thread", sample.thread_ns), ("wait", sample.wait_ns)):
+                    self.clock_stats.setdefault(clock, TimingStats()).add(ns)
+            if memory is not None:
+                self.last_memory = memory
+                for key, value in memory.as_dict().items():
+                    self.memory_stats.setdefault(key, TimingStats()).add(value)
+        if self.name:
+            registry.add(self.name, elapsed)
+            if sample is not None:
+                registry.add(f"{self.name}.process_cpu", sample.process_ns / 1e9)
+                registry.add(f"{self.name}.thread_cpu", sample.thread_ns / 1e9)
+                registry.add(f"{self.name}.wait", sample.wait_ns / 1e9)
+            if memory is not None:
+                for key, value in memory.as_dict().items():
+                    if key == "overhead_ns":
+                        registry.add(f"{self.name}.memory_overhead", value / 1e9)
+                    else:
+                        registry.add(f"{self.name}.{key}", value)
+        if self.sink is not None:
+            # Raw sample only, the sink's writer thread does the formatting
+            self.sink.record(self.name or self.text, elapsed_ns, None if self.name else self.text)
+        return elapsed
     
     def log(self) -> None:
         """Calls self.logger to log the results of timing."""
-        min_time = float(min(self._time_array))
+        stats = self.stats
+        min_time = stats.min / 1e9
         if self.logger:
             # self.logger(self.text.format(self._elapsed_time))
-            self.logger(self.text.format(min_time))
+            details = []
+            if self.clocks and self.last_clocks is not None:
+                details.append(str(self.last_clocks))
+            if self.memory and self.last_memory is not None:
+                details.append(str(self.last_memory))
+            if details:
+                self.logger(f"{self.text.format(min_time)} (last run: {'; '.join(details)})")
+            else:
+                self.logger(self.text.format(min_time))
         # if self.name:
         #     self.timers[self.name] += self._elapsed_time
-        if len(self._time_array) == self.number and self.number > 1:
-            print(self._time_array)
+        if self.number > 1 and stats.count % self.number == 0:
+            # Samples of the last 'number' runs
+            print([f"{ns / 1e9:0.6f}" for ns in stats.recent()[-self.number:]])
         
     # Context Manager methods:
     def __enter__(self) -> "Timer":
@@ -87,17 +203,115 @@ class Timer(ContextDecorator):
         # Stop the timer
         self.stop()
         # If function has been timed for 'self.number' executions then we are done, log it
-        if len(self._time_array) == self.number or self.number == 1:
+        # (with a sink every sample has already been handed to it in stop())
+        if self.sink is None and self.stats.count % self.number == 0:
             self.log()
         # If trace is set to true then print type, value, and traceback
         if self.trace:
             print(f"type: {exc_type}, value: {exc_value}, trace: {traceback}")
+
+    async def __aenter__(self) -> "Timer":
+        '''Same as __enter__, for 'async with' blocks'''
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        self.__exit__(exc_type, exc_value, traceback)
         
     
+    # ============
+    # Adaptive mode
+    # ============
+    @staticmethod
+    def _batch(func, args, kwargs, loops: int) -> int:
+        # Time 'loops' calls of func in one block, returns ns
+        it = itertools.repeat(None, loops)
+        tic = time.perf_counter_ns()
+        for _ in it:
+            func(*args, **kwargs)
+        return time.perf_counter_ns() - tic
+
+    @staticmethod
+    def calibrate(loops: int, trials: int = 20) -> float:
+        """Cost in ns of an empty timed block of 'loops' iterations (clock reads plus loop), best of 'trials'"""
+        best = None
+        for _ in range(trials):
+            it = itertools.repeat(None, loops)
+            tic = time.perf_counter_ns()
+            for _ in it:
+                pass
+            elapsed = time.perf_counter_ns() - tic
+            best = elapsed if best is None else min(best, elapsed)
+        return float(best)
+
+    def autorange(self, func, args=(), kwargs=None) -> int:
+        """Smallest loop count from 1, 2, 5, 10, 20, 50, ... whose batch takes at least min_batch seconds"""
+        kwargs = kwargs or {}
+        for exponent in itertools.count():
+            for multiple in (1, 2, 5):
+                loops = multiple * 10 ** exponent
+                if self._batch(func, args, kwargs, loops) >= self.min_batch * 1e9:
+                    return loops
+
+    def measure(self, func, *args, **kwargs) -> Any:
+        """Time func(*args, **kwargs) in adaptive mode, returns the result of one call.
+           The stopping test and the log line only use this call's samples, they are added to .stats afterwards."""
+        stats = TimingStats()
+        gc_was_enabled = gc.isenabled()
+        if self.disable_gc:
+            gc.disable()
+        try:
+            result = func(*args, **kwargs)
+            for _ in range(self.warmup):
+                func(*args, **kwargs)
+            self.loops = self.autorange(func, args, kwargs)
+            self.overhead_ns = self.calibrate(self.loops)
+
+            deadline = time.perf_counter_ns() + self.budget * 1e9
+            batches = 0
+            while True:
+                elapsed = self._batch(func, args, kwargs, self.loops)
+                stats.add(max(round((elapsed - self.overhead_ns) / self.loops), 0))
+                batches += 1
+                if batches >= self.min_repeat and stats.mean > 0:
+                    half_width = 1.96 * stats.stdev / math.sqrt(stats.count)
+                    if half_width <= self.target_ci * stats.mean:
+                        break
+                if time.perf_counter_ns() >= deadline:
+                    break
+        finally:
+            if self.disable_gc and gc_was_enabled:
+                gc.enable()
+        with self._lock:
+            self.stats.merge(stats)
+        if self.logger:
+            self.logger(self.adaptive_summary(stats, batches, getattr(func, "__qualname__", repr(func))))
+        return result
+
+    def adaptive_summary(self, stats: TimingStats, batches: int, label: str) -> str:
+        """One line for a measure() run: the numbers are per call in ns, since adaptive mode is for sub-microsecond calls"""
+        half_width = 1.96 * stats.stdev / math.sqrt(stats.count) if stats.count > 1 else float("nan")
+        return (f"{self.name or label}: {stats.mean:0.1f} ns/call +- {half_width:0.1f} ns (95% CI), "
+                f"min {stats.min} ns, {self.loops} loops x {batches} batches, "
+                f"overhead {self.overhead_ns / self.loops:0.2f} ns/call subtracted")
+
     # Makes this class a 'Callable' which is needed in order to use it as a decorator, technically not needed since it inherits from 'ContextDecorator'
     def __call__(self, func):
+        if inspect.iscoroutinefunction(func):
+            if self.adaptive:
+                raise TimerError("adaptive mode calls the function in a loop, it cannot time 'async def' functions")
+
+            @functools.wraps(func)
+            async def async_wrapper_timer(*args, **kwargs):
+                for x in range(self.number):
+                    async with self:
+                        result = await func(*args, **kwargs)
+                return result
+            return async_wrapper_timer
+
         @functools.wraps(func)
         def wrapper_timer(*args, **kwargs):
+            if self.adaptive:
+                return self.measure(func, *args, **kwargs)
             # Loop to execute 'self.number' time trials
             # self._time_array = []
             for x in range(self.number):   
@@ -110,29 +324,23 @@ class Timer(ContextDecorator):
         return wrapper_timer
    
 
-# This decorator works as a timer if there is only one recursive call in the return statement
+# Times only the outermost call of a recursive function, however many recursive calls it makes.
+# Whether a call is already active is kept in a ContextVar, so threads and asyncio tasks don't interfere.
+# For a breakdown per call path use Timer_calltree.CallTree instead.
 def RecTimer(func):
-        top = True
+        active = ContextVar(f"RecTimer_{func.__qualname__}", default=False)
         @functools.wraps(func)
         def wrapper_timer(*args, **kwargs):
-            nonlocal top
-            if top:
-                top = False
-                t0 = time.perf_counter()
-                result = func(*args, **kwargs)
-                elapsed = time.perf_counter() - t0
-                print("Elapsed time: {:0.6f} seconds".format(elapsed))
-            else:
+            if active.get():
+                return func(*args, **kwargs)
+            token = active.set(True)
+            t0 = time.perf_counter()
+            try:
                 result = func(*args, **kwargs)
-                top = True
+            finally:
+                active.reset(token)
+            elapsed = time.perf_counter() - t0
+            print("Elapsed time: {:0.6f} seconds".format(elapsed))
             return result
         
         return wrapper_timer
-
-
-
-
-
-
-
-
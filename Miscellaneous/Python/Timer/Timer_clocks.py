@@ -0,0 +1,61 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+"""
+-Reads three clocks at once, all as integer nanoseconds (see time_notes.txt):
+ wall:    time.perf_counter_ns(), CLOCK_MONOTONIC on Linux
+ process: time.process_time_ns(), CLOCK_PROCESS_CPUTIME_ID, CPU time of all threads of the process
+ thread:  time.thread_time_ns(), the calling thread's CPU clock (what pthread_getcpuclockid gives for it)
+-The difference between wall and thread CPU time is time the thread was not running: waiting on I/O,
+ locks, sleep, or for the scheduler. A block with cpu_fraction near 1 is CPU-bound, near 0 it is waiting.
+-Process CPU time above thread CPU time means other threads were busy meanwhile, above wall time
+ means the process used more than one core.
+-Under asyncio the thread clock also counts other tasks that ran on the event loop during an await.
+"""
+
+CPU_BOUND = 0.8   # cpu_fraction at or above this is reported as CPU-bound
+WAIT_BOUND = 0.2  # cpu_fraction at or below this is reported as waiting
+
+def read() -> Tuple[int, int, int]:
+    """(process, thread, wall) readings, CPU clocks first so they enclose the wall reading"""
+    return time.process_time_ns(), time.thread_time_ns(), time.perf_counter_ns()
+
+@dataclass
+class ClockSample:
+    wall_ns:    int
+    process_ns: int
+    thread_ns:  int
+
+    @classmethod
+    def since(cls, start: Tuple[int, int, int]) -> "ClockSample":
+        """Sample from a read() made at the start of the block until now"""
+        wall = time.perf_counter_ns()
+        thread = time.thread_time_ns()
+        process = time.process_time_ns()
+        return cls(wall - start[2], process - start[0], thread - start[1])
+
+    @property
+    def wait_ns(self) -> int:
+        """Wall time the thread spent off the CPU"""
+        return max(self.wall_ns - self.thread_ns, 0)
+
+    @property
+    def cpu_fraction(self) -> float:
+        return min(self.thread_ns / self.wall_ns, 1.0) if self.wall_ns else 0.0
+
+    @property
+    def kind(self) -> str:
+        if self.cpu_fraction >= CPU_BOUND:
+            return "cpu-bound"
+        if self.cpu_fraction <= WAIT_BOUND:
+            return "waiting"
+        return "mixed"
+
+    def seconds(self) -> Dict[str, float]:
+        return {"wall": self.wall_ns / 1e9, "process_cpu": self.process_ns / 1e9,
+                "thread_cpu": self.thread_ns / 1e9, "wait": self.wait_ns / 1e9}
+
+    def __str__(self) -> str:
+        return (f"wall {self.wall_ns / 1e9:0.6f} s, thread cpu {self.thread_ns / 1e9:0.6f} s, "
+                f"process cpu {self.process_ns / 1e9:0.6f} s, wait {self.wait_ns / 1e9:0.6f} s ({self.kind})")
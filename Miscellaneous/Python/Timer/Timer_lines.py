@@ -0,0 +1,359 @@
+import dis
+import functools
+import inspect
+import linecache
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+"""
+-line_timer collects hit counts and time per source line of one function, like line_profiler/kernprof
+ but from the standard library:
+     @line_timer
+     def bubble_sort(array): ...
+     bubble_sort(data)
+     print(bubble_sort.line_timer.report())
+ or, for a function that is called from somewhere else (merge is called by merge_sort):
+     timer = LineTimer(sorting.merge)
+     with timer:
+         sorting.merge_sort(data)
+     print(timer.report())
+-The time of a line runs from the moment it starts until the next line of the same call starts,
+ so it includes the functions it calls. Decorated functions (sorting.py's @keyed) are unwrapped,
+ the lines of the innermost function are timed.
+-Python 3.12+ uses sys.monitoring: every active LineTimer claims a tool id of its own (there are three
+ to spare) and switches events on for the timed function's code object only, so everything else runs
+ at full speed and the callbacks, closures over the timer's counters, need no lookup per event.
+ Other monitoring tools are left alone. sys.monitoring sees the function in every thread, so time it
+ from one thread at a time. LineTimer(func, monitoring=False) forces the settrace fallback.
+-Older interpreters, or a LineTimer that finds no free tool id, fall back to sys.settrace: every call
+ made while the timer is active costs one extra Python-level call, but only the timed function's lines
+ are traced. Calls of other functions are passed on to the trace function that was active before,
+ but that one (a debugger, coverage) misses the timed function's lines. Only the thread that activated
+ the timer is traced.
+-Cost, python -m Timer.Timer_lines --size 1000, as a multiple of the untimed run, best of 3. The full traces
+ see every line of every function; the collecting one reads the clock per line and adds it up per (code, line),
+ the least a line profiler built on tracing has to do, the empty one does nothing and measures nothing.
+     merge timed inside merge_sort(50000), the usual case:
+     Python   sys.monitoring   sys.settrace   collecting full trace   empty full trace
+     3.11     -                21x            44x                     8x
+     3.12     16x              39x            111x                    9x
+     3.13     15x              24x            93x                     5x
+     bubble_sort(1000), whose lines are so cheap that this is close to the worst case:
+     3.11     -                19x            44x                     7x
+     3.12     13x              19x            62x                     6x
+     3.13     10x              15x            43x                     2x
+ Most of the cost is the callback itself plus one clock reading per line. Storing the readings in a buffer
+ and adding them up later was measured too: the callbacks get cheaper, but the adding up costs more than
+ doing it in place, so the counters are updated in the callback.
+-Recursive calls each get their own line state, but the time of the line making the recursive call
+ includes the nested call, so totals overlap the same way inclusive times do.
+-Generators and coroutines are not supported: time spent suspended is charged to the line that yielded.
+"""
+
+MONITORING = hasattr(sys, "monitoring")
+_TOOL_NAME = "line_timer"
+_TOOL_IDS = (2, 3, 4)  # PROFILER_ID and the two unassigned ids, the debugger/coverage/optimizer ids are left alone
+
+class LineTimer:
+    def __init__(self, func: Callable, monitoring: Optional[bool] = None) -> None:
+        self.func = inspect.unwrap(func)
+        self.code = self.func.__code__
+        self.monitoring = MONITORING if monitoring is None else monitoring  # False forces the settrace fallback
+        self.calls = 0
+        # Hits and ns per line are lists indexed by line - first line, the extra last slot collects
+        # the time before the first line of a call, so the per-line code needs no 'is there a line' test
+        self._first = self.code.co_firstlineno
+        lines = [line for _, line in dis.findlinestarts(self.code) if line is not None]
+        self._none = max(lines, default=self._first) - self._first + 1
+        self._hits = [0] * (self._none + 1)
+        self._ns = [0] * (self._none + 1)
+        self._local = threading.local()   # settrace: depth and previous trace function per thread
+        self._depth = 0                    # sys.monitoring: events are on while this is above zero
+        self._lock = threading.Lock()
+        self._tool: Optional[int] = None   # sys.monitoring: tool id claimed while enabled
+        self._stack: List[tuple] = []      # sys.monitoring: (line, start) of every suspended call, innermost last
+        self._unwind: Callable[[int], None] = lambda depth: None
+        self.mode = "sys.monitoring" if self.monitoring else "sys.settrace"
+
+    @property
+    def hits(self) -> Dict[int, int]:
+        """Line number -> times it ran"""
+        return {self._first + i: n for i, n in enumerate(self._hits[:-1]) if n}
+
+    @property
+    def ns(self) -> Dict[int, int]:
+        """Line number -> ns from the start of that line to the start of the next one"""
+        return {self._first + i: self._ns[i] for i, n in enumerate(self._hits[:-1]) if n}
+
+    # ===================
+    # settrace fallback
+    # ===================
+    def _global_trace(self, frame, event: str, arg: Any):
+        if frame.f_code is not self.code:
+            # Other calls go to the trace function that was active before, so nested LineTimers all count
+            previous = self._local.previous
+            return previous(frame, event, arg) if previous is not None else None
+        self.calls += 1
+        # The clock is read once per event, as line_profiler does. The bookkeeping between two reads is
+        # charged to the line being left, so every hit carries about the same fixed extra cost.
+        hits, spent, clock, first, none = self._hits, self._ns, time.perf_counter_ns, self._first, self._none
+        last = none
+        start = 0
+
+        def local_trace(frame, event: str, arg: Any):
+            nonlocal last, start
+            now = clock()
+            spent[last] += now - start
+            if event == "line":
+                last = frame.f_lineno - first
+                hits[last] += 1
+            elif event == "return":
+                last = none
+            start = now
+            return local_trace
+        return local_trace
+
+    def _enable_trace(self) -> None:
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            self._local.previous = sys.gettrace()
+            sys.settrace(self._global_trace)
+        self._local.depth = depth + 1
+
+    def _disable_trace(self) -> None:
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            sys.settrace(self._local.previous)
+            self._local.previous = None
+
+    # ===============
+    # sys.monitoring
+    # ===============
+    def _enable_monitoring(self) -> bool:
+        """Claim a tool id of our own and switch on events for self.code only, False if every id is taken"""
+        with self._lock:
+            if self._depth > 0:
+                self._depth += 1
+                return True
+            monitoring = sys.monitoring
+            for tool in _TOOL_IDS:
+                try:
+                    monitoring.use_tool_id(tool, _TOOL_NAME)
+                except ValueError:
+                    continue  # Taken by another tool or another active LineTimer
+                break
+            else:
+                return False
+            self._tool = tool
+            self._depth = 1
+            events = monitoring.events
+            on_start, on_return, on_line = self._callbacks()
+            monitoring.register_callback(tool, events.PY_START, on_start)
+            monitoring.register_callback(tool, events.PY_RETURN, on_return)
+            monitoring.register_callback(tool, events.LINE, on_line)
+            # Local events of a tool nobody else uses: the callbacks only ever see self.code,
+            # so they need no lookup of which timer an event belongs to
+            monitoring.set_local_events(tool, self.code, events.PY_START | events.PY_RETURN | events.LINE)
+            return True
+
+    def _callbacks(self) -> tuple:
+        # Per-line state lives in closure cells, the cheapest thing a callback can read and write
+        hits, spent, clock, first, none, stack = self._hits, self._ns, time.perf_counter_ns, self._first, self._none, self._stack
+        last = none
+        start = 0
+
+        def on_start(code, offset: int) -> None:
+            nonlocal last
+            self.calls += 1
+            stack.append((last, start))
+            last = none
+
+        def on_return(code, offset: int, retval: Any) -> None:
+            nonlocal last, start
+            spent[last] += clock() - start
+            last, start = stack.pop() if stack else (none, 0)
+
+        def on_line(code, line: int) -> None:
+            nonlocal last, start
+            now = clock()
+            spent[last] += now - start
+            last = line - first
+            hits[last] += 1
+            start = now
+
+        def unwind(depth: int) -> None:
+            # A call left by an exception gets no PY_RETURN, go back to the state of its caller
+            nonlocal last, start
+            if len(stack) > depth:
+                spent[last] += clock() - start
+                last, start = stack[depth]
+                del stack[depth:]
+
+        self._unwind = unwind
+        return on_start, on_return, on_line
+
+    def _disable_monitoring(self) -> None:
+        with self._lock:
+            self._depth -= 1
+            if self._depth > 0:
+                return
+            monitoring = sys.monitoring
+            events = monitoring.events
+            monitoring.set_local_events(self._tool, self.code, 0)
+            for event in (events.PY_START, events.PY_RETURN, events.LINE):
+                monitoring.register_callback(self._tool, event, None)
+            monitoring.free_tool_id(self._tool)
+            self._tool = None
+            self._stack.clear()
+            self._unwind = lambda depth: None
+
+    # =========================
+    # Context manager interface
+    # =========================
+    def __enter__(self) -> "LineTimer":
+        # With every tool id taken (other profilers, several LineTimers at once) this one traces instead
+        if self.monitoring and self._enable_monitoring():
+            self.mode = "sys.monitoring"
+        else:
+            self.mode = "sys.settrace"
+            self._enable_trace()
+        self._local.modes = getattr(self._local, "modes", []) + [self.mode]
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._local.modes.pop() == "sys.monitoring":
+            self._disable_monitoring()
+        else:
+            self._disable_trace()
+
+    def reset(self) -> None:
+        self._hits[:] = [0] * len(self._hits)
+        self._ns[:] = [0] * len(self._ns)
+        self.calls = 0
+
+    # ========
+    # Report
+    # ========
+    def report(self) -> str:
+        """Source of the function with hits, total ms, ns per hit and share of the time per line"""
+        hits, spent = self.hits, self.ns
+        try:
+            lines, first = inspect.getsourcelines(self.func)
+        except (OSError, TypeError):
+            filename = self.code.co_filename
+            first = self.code.co_firstlineno
+            last = max(hits, default=first)
+            lines = [linecache.getline(filename, n) for n in range(first, last + 1)]
+        total = sum(spent.values()) or 1
+        out = [f"{self.func.__qualname__}: {self.calls} calls, {sum(spent.values()) / 1e6:0.3f} ms ({self.mode})",
+               f"{'Line':>6} {'Hits':>10} {'Time ms':>10} {'Per hit ns':>11} {'% Time':>7}  Source"]
+        for number, source in enumerate(lines, first):
+            count = hits.get(number)
+            if count:
+                ns = spent.get(number, 0)
+                out.append(f"{number:>6} {count:>10} {ns / 1e6:>10.3f} {ns / count:>11.1f} {100 * ns / total:>6.1f}%  {source.rstrip()}")
+            else:
+                out.append(f"{number:>6} {'':>10} {'':>10} {'':>11} {'':>7}  {source.rstrip()}")
+        return "\n".join(out)
+
+# =========
+# Decorator
+# =========
+def line_timer(func: Callable) -> Callable:
+    """Time every line of func while it runs, results in wrapper.line_timer"""
+    timer = LineTimer(func)
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        depth = len(timer._stack)
+        with timer:
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                # sys.monitoring has no local event for leaving by an exception, undo that call here
+                timer._unwind(depth)
+                raise
+
+    wrapper.line_timer = timer
+    return wrapper
+
+# =========
+# Benchmark
+# =========
+def main(argv: Sequence[str] = None) -> int:
+    import argparse
+    import random
+    import sorting
+
+    parser = argparse.ArgumentParser(description="Line timings of bubble_sort and merge, with the cost of collecting them")
+    parser.add_argument("--size", type=int, default=1000, help="Items to bubble sort, merge_sort gets 50x as many")
+    args = parser.parse_args(argv)
+
+    small = [random.random() for _ in range(args.size)]
+    big = [random.random() for _ in range(50 * args.size)]
+
+    def best(run: Callable[[], Any], repeat: int = 3) -> float:
+        times = []
+        for _ in range(repeat):
+            tic = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - tic)
+        return min(times)
+
+    # Full tracing for comparison: every line of every function, either collecting nothing
+    # or doing what a line profiler has to, a clock reading per line added up per (code, line)
+    def empty_trace(frame, event, arg):
+        return empty_trace
+
+    def collecting_trace(frame, event, arg):
+        clock = time.perf_counter_ns
+        last = None
+        start = 0
+
+        def local_trace(frame, event, arg):
+            nonlocal last, start
+            now = clock()
+            if last is not None:
+                spent[last] = spent.get(last, 0) + now - start
+            last = (frame.f_code, frame.f_lineno) if event == "line" else None
+            start = now
+            return local_trace
+        return local_trace
+    spent: Dict[tuple, int] = {}
+
+    def traced(trace: Callable, run: Callable[[], Any]) -> Callable[[], None]:
+        def call() -> None:
+            sys.settrace(trace)
+            try:
+                run()
+            finally:
+                sys.settrace(None)
+        return call
+
+    print(f"Python {sys.version.split()[0]}, best of 3, as a multiple of the untimed run")
+    timers = []
+    for label, func, run in [(f"bubble_sort({args.size})", sorting.bubble_sort, lambda: sorting.bubble_sort(small.copy())),
+                             (f"merge in merge_sort({len(big)})", sorting.merge, lambda: sorting.merge_sort(big.copy()))]:
+        plain = best(run)
+        rows = []
+        for monitoring in ([True, False] if MONITORING else [False]):
+            timer = LineTimer(func, monitoring=monitoring)
+
+            def timed() -> None:
+                with timer:
+                    run()
+            rows.append((f"line_timer ({timer.mode})", best(timed)))
+            timers.append(timer)
+        rows.append(("empty full trace", best(traced(empty_trace, run))))
+        rows.append(("collecting full trace", best(traced(collecting_trace, run))))
+        print(f"{label}: plain {plain:0.4f} s")
+        for name, seconds in rows:
+            print(f"{name:>30}: {seconds:0.4f} s ({seconds / plain:0.1f}x)")
+    print()
+    print(timers[-1].report())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
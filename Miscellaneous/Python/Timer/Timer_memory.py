@@ -0,0 +1,88 @@
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+"""
+-Memory use of a block of code, measured next to its elapsed time:
+ peak_bytes:     highest traced memory during the block, above what was in use when it started
+ net_bytes:      traced memory at the end minus at the start (what the block left allocated)
+ blocks:         change in sys.getallocatedblocks(), the net number of memory blocks the block left allocated.
+                 CPython has no cheap count of every allocation, so short-lived temporaries don't show here;
+                 they show in peak_bytes and in the gen-0 collections they trigger.
+ gc_collections: collections per generation (0, 1, 2) that ran during the block
+-tracemalloc is started on the first start() if it is not running yet and stopped again by the matching stop().
+ While it runs every allocation is slower (often 2x or more for allocation-heavy code), so compare timings
+ from runs without memory mode. The cost of start()/stop() themselves is kept out of the timed window by
+ Timer and reported as overhead_ns.
+-Nested memory blocks share tracemalloc's single peak, which every start() resets so the inner block's peak
+ is its own. Before the reset, the peak so far is folded into the running maximum of every block still
+ active, and stop() reports the larger of that maximum and the current peak, so outer blocks keep peaks
+ reached before an inner block started.
+"""
+
+# States of the blocks between start() and stop(), in start order, guarded by _active_lock
+_active: List[list] = []
+_active_lock = threading.Lock()
+
+@dataclass
+class MemorySample:
+    peak_bytes:     int
+    net_bytes:      int
+    blocks:         int
+    gc_collections: Tuple[int, int, int]
+    overhead_ns:    int = 0  # Time spent in start() and stop(), not included in the block's elapsed time
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"peak_bytes": self.peak_bytes, "net_bytes": self.net_bytes, "blocks": self.blocks,
+                "gc0": self.gc_collections[0], "gc1": self.gc_collections[1], "gc2": self.gc_collections[2],
+                "overhead_ns": self.overhead_ns}
+
+    def __str__(self) -> str:
+        return (f"peak {self.peak_bytes / 1024:0.1f} KiB, net {self.net_bytes / 1024:+0.1f} KiB, "
+                f"blocks {self.blocks:+d}, gc {self.gc_collections[0]}/{self.gc_collections[1]}/{self.gc_collections[2]}")
+
+def _collections() -> Tuple[int, ...]:
+    return tuple(generation["collections"] for generation in gc.get_stats())
+
+def start() -> list:
+    """Begin measuring, returns the state stop() needs:
+       [started tracemalloc, traced bytes, allocated blocks, gc collections, overhead ns, running peak]"""
+    tic = time.perf_counter_ns()
+    with _active_lock:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        else:
+            # The reset would lose the peak the enclosing blocks reached so far, keep it in their states
+            _, peak = tracemalloc.get_traced_memory()
+            for outer in _active:
+                outer[5] = max(outer[5], peak)
+            tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        state = [started, current, sys.getallocatedblocks(), _collections(), 0, current]
+        _active.append(state)
+    state[4] = time.perf_counter_ns() - tic
+    return state
+
+def stop(state: list) -> MemorySample:
+    """Finish measuring the block begun by start()"""
+    tic = time.perf_counter_ns()
+    started, current_start, blocks_start, collections_start, start_overhead, running_peak = state
+    with _active_lock:
+        current, peak = tracemalloc.get_traced_memory()
+        # By identity, two states can hold equal values
+        del _active[next(i for i, active in enumerate(_active) if active is state)]
+    peak = max(peak, running_peak)
+    blocks = sys.getallocatedblocks()
+    collections = _collections()
+    if started:
+        tracemalloc.stop()
+    return MemorySample(peak_bytes=max(peak - current_start, 0),
+                        net_bytes=current - current_start,
+                        blocks=blocks - blocks_start,
+                        gc_collections=tuple(end - begin for begin, end in zip(collections_start, collections)),
+                        overhead_ns=start_overhead + time.perf_counter_ns() - tic)
@@ -0,0 +1,106 @@
+import threading
+from typing import Dict, Iterator, List, Tuple
+
+"""
+-Registry holds named totals for timers and counters: per name the number of records,
+ their total and the largest single record. Timers record seconds, counters record amounts.
+-Every thread writes to its own shard (a plain dict reached through threading.local), so
+ add() never takes a lock and threads never wait on each other. asyncio tasks run on their
+ event loop's thread and share its shard, which is safe because add() never awaits.
+-Reads merge all shards. A shard is copied with dict.copy(), which is atomic under the GIL,
+ so reading while other threads record is safe; a record that is half applied at that moment
+ may be missing from the count or the total until the next read.
+-It also behaves like the old TimerDC.timers dict for reading: registry[name] is the total.
+
+     registry.add("db.query", 0.012)
+     registry.add("cache.hits")
+     registry.snapshot()  ->  {"db.query": {"count": 1, "total": 0.012, "max": 0.012}, ...}
+"""
+
+class Registry:
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: List[Dict[str, List[float]]] = []  # name -> [count, total, max], one dict per thread
+        self._lock = threading.Lock()                     # Only taken when a thread creates its shard or on reset
+
+    def _shard(self) -> Dict[str, List[float]]:
+        shard: Dict[str, List[float]] = {}
+        self._local.shard = shard
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def add(self, name: str, value: float = 1) -> None:
+        """Record one value under name"""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        entry = shard.get(name)
+        if entry is None:
+            shard[name] = [1, value, value]
+        else:
+            entry[0] += 1
+            entry[1] += value
+            if value > entry[2]:
+                entry[2] = value
+
+    def setdefault(self, name: str, default: float = 0) -> float:
+        """Make name show up in reads before anything is recorded, like dict.setdefault for the old timers dict"""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        if name not in shard:
+            shard[name] = [0, default, default]
+        return self[name]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per name: count, total and max over all threads"""
+        with self._lock:
+            shards = [shard.copy() for shard in self._shards]
+        merged: Dict[str, Dict[str, float]] = {}
+        for shard in shards:
+            for name, (count, total, largest) in shard.items():
+                entry = merged.get(name)
+                if entry is None:
+                    merged[name] = {"count": count, "total": total, "max": largest}
+                else:
+                    entry["count"] += count
+                    entry["total"] += total
+                    entry["max"] = max(entry["max"], largest)
+        return merged
+
+    def reset(self) -> None:
+        """Forget every name. Shards are cleared in place, so threads keep writing to them."""
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+    # Read-only dict interface over the totals
+    def totals(self) -> Dict[str, float]:
+        return {name: entry["total"] for name, entry in self.snapshot().items()}
+
+    def __getitem__(self, name: str) -> float:
+        entry = self.snapshot().get(name)
+        if entry is None:
+            raise KeyError(name)
+        return entry["total"]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.snapshot()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.snapshot())
+
+    def __len__(self) -> int:
+        return len(self.snapshot())
+
+    def items(self) -> List[Tuple[str, float]]:
+        return list(self.totals().items())
+
+    def __repr__(self) -> str:
+        return f"Registry({self.totals()!r})"
+
+# Shared by TimerDC, Timer_class.Timer and memoize
+registry = Registry()
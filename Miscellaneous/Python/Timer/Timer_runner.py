@@ -0,0 +1,224 @@
+import argparse
+import ast
+import inspect
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+"""
+-Runs every Timer-decorated function as a benchmark, each one in a fresh interpreter, so benchmarks
+ don't share heap state, GC history, caches or imports (sorting.py used to run every algorithm in one process).
+     python -m Timer.Timer_runner .                                  # every benchmark that takes no arguments
+     python -m Timer.Timer_runner . --call "scratch_fibo.func1(25)"  # with arguments
+-Discovery reads the source with ast, without importing anything: module-level functions whose decorator
+ is Timer(...), Timer_class.Timer(...), TimerDC(...) or RecTimer. Functions with required parameters
+ are only run when --call gives their arguments.
+-Each worker is started with -X importtime. It reports:
+ import: how long importing the benchmark's module took (-X importtime cumulative time),
+         plus the slowest imports it pulled in
+ cold:   the first call, right after the import
+ warm:   the median of the next --warm calls
+ The decorator is unwrapped first, so the numbers are of the function itself, not of Timer's logging.
+-Every benchmark gets --runs fresh processes, the table shows the median over them.
+ --cpu pins the workers to one CPU with os.sched_setaffinity (Linux only).
+-The old 'import timing' in sorting.py pointed at a module that only existed as a stale .pyc
+ and is gone; sorting.py's algorithms are benchmarked by sort_bench.py/baseline.py instead.
+"""
+
+TIMER_DECORATORS = {"Timer", "TimerDC", "RecTimer"}
+
+# =========
+# Discovery
+# =========
+def _decorator_name(node: ast.expr) -> str:
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return ""
+
+def discover(paths: Sequence[str]) -> List[Dict[str, Any]]:
+    """Timer-decorated module-level functions in the given files or directories"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".py"))
+        else:
+            files.append(path)
+    found = []
+    for filename in files:
+        with open(filename) as f:
+            try:
+                tree = ast.parse(f.read(), filename)
+            except SyntaxError:
+                continue
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and \
+                    any(_decorator_name(d) in TIMER_DECORATORS for d in node.decorator_list):
+                required = len(node.args.posonlyargs) + len(node.args.args) - len(node.args.defaults)
+                required += sum(default is None for default in node.args.kw_defaults)
+                found.append({
+                    "module":   os.path.splitext(os.path.basename(filename))[0],
+                    "function": node.name,
+                    "dir":      os.path.dirname(os.path.abspath(filename)),
+                    "required": required,
+                    "async":    isinstance(node, ast.AsyncFunctionDef),
+                })
+    return found
+
+def parse_call(spec: str) -> Tuple[str, tuple]:
+    """'module.function(1, 2)' -> ('module.function', (1, 2)), arguments must be literals"""
+    if "(" not in spec:
+        return spec, ()
+    name, _, rest = spec.partition("(")
+    args = ast.literal_eval(f"({rest.rstrip()[:-1]},)") if rest.strip() != ")" else ()
+    return name.strip(), tuple(args)
+
+# ======
+# Worker
+# ======
+def worker(module: str, function: str, args: tuple, warm: int, cpu: Optional[int], out: str) -> None:
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+    tic = time.perf_counter_ns()
+    # __import__ rather than importlib.import_module: only imports through the C import path show in -X importtime
+    __import__(module)
+    mod = sys.modules[module]
+    import_ns = time.perf_counter_ns() - tic
+    func = inspect.unwrap(getattr(mod, function))
+    if inspect.iscoroutinefunction(func):
+        import asyncio
+        coroutine_func = func
+        func = lambda *a: asyncio.run(coroutine_func(*a))
+
+    tic = time.perf_counter_ns()
+    func(*args)
+    cold = time.perf_counter_ns() - tic
+    samples = []
+    for _ in range(warm):
+        tic = time.perf_counter_ns()
+        func(*args)
+        samples.append(time.perf_counter_ns() - tic)
+    with open(out, "w") as f:
+        json.dump({"import_ns": import_ns, "cold_ns": cold, "warm_ns": samples}, f)
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(package, nesting depth, self us, cumulative us) of every 'import time:' line of -X importtime"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) == 3:
+            name = fields[2].rstrip()
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            rows.append((name.strip(), depth, int(fields[0]), int(fields[1])))
+    return rows
+
+def module_imports(rows: List[Tuple[str, int, int, int]], module: str) -> Tuple[Optional[int], List[Tuple[str, int]]]:
+    """Cumulative us of importing module and (package, self us) of everything it imported.
+       Nested imports are printed before the import that triggered them, one level deeper."""
+    for index, (package, depth, _, cumulative) in enumerate(rows):
+        if package == module:
+            children = []
+            for child, child_depth, own, _ in reversed(rows[:index]):
+                if child_depth <= depth:
+                    break
+                children.append((child, own))
+            return cumulative, children
+    return None, []
+
+def run_one(benchmark: Dict[str, Any], args: tuple, warm: int, cpu: Optional[int]) -> Dict[str, Any]:
+    """Run one benchmark in a fresh interpreter"""
+    timer_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [benchmark["dir"], timer_root, env.get("PYTHONPATH")]))
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        out = f.name
+    command = [sys.executable, "-X", "importtime", "-m", "Timer.Timer_runner", "--worker",
+               benchmark["module"], benchmark["function"], json.dumps(list(args)), str(warm),
+               "" if cpu is None else str(cpu), out]
+    try:
+        tic = time.perf_counter_ns()
+        process = subprocess.run(command, cwd=benchmark["dir"], env=env, capture_output=True, text=True)
+        process_ns = time.perf_counter_ns() - tic
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()
+            raise RuntimeError(error[-1] if error else f"worker exited with {process.returncode}")
+        with open(out) as f:
+            result = json.load(f)
+    finally:
+        os.unlink(out)
+
+    module_us, children = module_imports(parse_importtime(process.stderr), benchmark["module"])
+    result["process_ns"] = process_ns
+    result["module_import_us"] = module_us
+    # Imports pulled in by the benchmark's module, slowest first
+    result["slowest_imports"] = sorted(children, key=lambda row: -row[1])[:5]
+    return result
+
+# ============
+# Command line
+# ============
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run Timer-decorated benchmarks, each in a fresh interpreter")
+    parser.add_argument("paths", nargs="*", default=["."], help="Files or directories to search for benchmarks")
+    parser.add_argument("--call", action="append", default=[], metavar="MODULE.FUNC(ARGS)",
+                        help="Arguments for a benchmark, also selects it; may be repeated")
+    parser.add_argument("--select", nargs="+", default=None, help="Only run these module.function benchmarks")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per benchmark")
+    parser.add_argument("--warm", type=int, default=5, help="Timed calls after the first one, per process")
+    parser.add_argument("--cpu", type=int, default=None, help="Pin workers to this CPU")
+    parser.add_argument("--json", default=None, help="Also write all results to this file")
+    parser.add_argument("--worker", nargs=6, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        module, function, call_args, warm, cpu, out = args.worker
+        worker(module, function, tuple(json.loads(call_args)), int(warm), int(cpu) if cpu else None, out)
+        return 0
+
+    calls = dict(parse_call(spec) for spec in args.call)
+    selected = set(args.select or []) | set(calls)
+    results = []
+    print(f"{'benchmark':<28} {'import ms':>10} {'cold ms':>10} {'warm ms':>10} {'process ms':>11}  slowest import")
+    for benchmark in discover(args.paths):
+        name = f"{benchmark['module']}.{benchmark['function']}"
+        if selected and name not in selected:
+            continue
+        if name not in calls and benchmark["required"]:
+            print(f"{name:<28} skipped, needs {benchmark['required']} argument(s): --call \"{name}(...)\"")
+            continue
+        try:
+            runs = [run_one(benchmark, calls.get(name, ()), args.warm, args.cpu) for _ in range(args.runs)]
+        except RuntimeError as error:
+            print(f"{name:<28} failed: {error}")
+            continue
+        row = {
+            "benchmark":  name,
+            "args":       list(calls.get(name, ())),
+            "import_ms":  statistics.median(r["module_import_us"] or 0 for r in runs) / 1e3,
+            "cold_ms":    statistics.median(r["cold_ns"] for r in runs) / 1e6,
+            "warm_ms":    statistics.median(ns for r in runs for ns in r["warm_ns"]) / 1e6 if args.warm else None,
+            "process_ms": statistics.median(r["process_ns"] for r in runs) / 1e6,
+            "runs":       runs,
+        }
+        results.append(row)
+        slowest = runs[0]["slowest_imports"][0] if runs[0]["slowest_imports"] else ("", 0)
+        warm = f"{row['warm_ms']:>10.3f}" if row["warm_ms"] is not None else f"{'':>10}"
+        print(f"{name:<28} {row['import_ms']:>10.3f} {row['cold_ms']:>10.3f} {warm} {row['process_ms']:>11.1f}  "
+              f"{slowest[0]} ({slowest[1] / 1e3:0.1f} ms)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
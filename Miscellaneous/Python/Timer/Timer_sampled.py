@@ -0,0 +1,192 @@
+import atexit
+import functools
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, List, Optional, Sequence
+
+from .Timer_registry import registry
+from .Timer_stats import TimingStats
+
+"""
+-sampled() is a timing decorator meant to stay on hot functions in production:
+     @sampled("db.query", every=1000)      times 1 call in every 1000
+     @sampled("db.query", interval=1.0)    times the first call after each second
+-Untimed calls cost one counter decrement (or one flag check) on top of the call. Timed calls append
+ the elapsed ns to a pending list, nothing is formatted or logged per call. A daemon thread moves the
+ pending samples into the shared registry (seconds, so count/total/max per name) and into the
+ decorator's own .stats every FLUSH_INTERVAL seconds; a full batch is flushed inline and whatever is
+ left is flushed at exit. The registry count is the number of timed calls, not of all calls.
+-With the environment variable TIMER_DISABLED set to 1/true/yes, or enabled=False, the decorator
+ returns the function itself, so there is no overhead at all. This is decided when decorating.
+-Under threads the 1-in-N counter is not locked, so the rate is approximate.
+
+command line example (overhead per call of the different modes):
+python -m Timer.Timer_sampled --calls 1e6
+"""
+
+ENV_VAR = "TIMER_DISABLED"
+FLUSH_INTERVAL = 0.1  # Seconds between background flushes, also the resolution of interval=
+BATCH = 1024          # Pending samples that trigger an inline flush, bounds memory without the thread
+
+def disabled() -> bool:
+    return os.environ.get(ENV_VAR, "").strip().lower() in ("1", "true", "yes", "on")
+
+class _Site:
+    """Pending samples of one decorated function"""
+    __slots__ = ("name", "pending", "stats", "interval_ns", "next_ns", "arm", "lock")
+
+    def __init__(self, name: str, interval: Optional[float], arm: Optional[Callable[[], None]]) -> None:
+        self.name = name
+        self.pending: List[int] = []
+        self.stats = TimingStats()
+        self.interval_ns = None if interval is None else int(interval * 1e9)
+        self.next_ns = 0
+        self.arm = arm
+        self.lock = threading.Lock()  # One flush at a time: inline flushes and the flusher thread race otherwise
+
+    def flush(self) -> None:
+        # Appends only go to the end and don't take the lock, so deleting the copied prefix never loses a sample
+        with self.lock:
+            batch = self.pending[:]
+            del self.pending[:len(batch)]
+            for ns in batch:
+                self.stats.add(ns)
+                registry.add(self.name, ns / 1e9)
+
+_sites: List[_Site] = []
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+
+def _background() -> None:
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        now = time.perf_counter_ns()
+        with _lock:
+            sites = list(_sites)
+        for site in sites:
+            if site.arm is not None and now >= site.next_ns:
+                site.next_ns = now + site.interval_ns
+                site.arm()
+            if site.pending:
+                site.flush()
+
+def flush() -> None:
+    """Move every pending sample into the registry now"""
+    with _lock:
+        sites = list(_sites)
+    for site in sites:
+        site.flush()
+
+def _register(site: _Site) -> None:
+    global _thread
+    with _lock:
+        _sites.append(site)
+        if _thread is None:
+            _thread = threading.Thread(target=_background, name="Timer_sampled", daemon=True)
+            _thread.start()
+            atexit.register(flush)
+
+def sampled(name: Optional[str] = None, every: int = 100, interval: Optional[float] = None,
+            enabled: Optional[bool] = None) -> Callable:
+    """Time 1 in 'every' calls, or with interval= the first call after every 'interval' seconds.
+       enabled=None follows the TIMER_DISABLED environment variable."""
+    if every < 1:
+        raise ValueError(f"every must be at least 1, got {every}")
+
+    def decorator(func: Callable) -> Callable:
+        if not (enabled if enabled is not None else not disabled()):
+            return func
+        clock = time.perf_counter_ns
+
+        if interval is not None:
+            armed = False
+
+            def arm() -> None:
+                nonlocal armed
+                armed = True
+
+            site = _Site(name or func.__qualname__, interval, arm)
+            pending = site.pending
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                nonlocal armed
+                if not armed:
+                    return func(*args, **kwargs)
+                armed = False
+                tic = clock()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    pending.append(clock() - tic)
+        else:
+            countdown = every
+            site = _Site(name or func.__qualname__, None, None)
+            pending = site.pending
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                nonlocal countdown
+                countdown -= 1
+                if countdown > 0:
+                    return func(*args, **kwargs)
+                countdown = every
+                tic = clock()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    pending.append(clock() - tic)
+                    if len(pending) >= BATCH:
+                        site.flush()
+
+        _register(site)
+        wrapper.stats = site.stats
+        wrapper.flush = site.flush
+        return wrapper
+    return decorator
+
+# =========
+# Benchmark
+# =========
+def main(argv: Sequence[str] = None) -> int:
+    import argparse
+    from .Timer_class import Timer
+
+    parser = argparse.ArgumentParser(description="Per-call overhead of sampled() against an undecorated call")
+    parser.add_argument("--calls", type=lambda s: int(float(s)), default=10**6, help="Calls per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements per mode, the best one is reported")
+    args = parser.parse_args(argv)
+
+    def work(x):
+        return x + 1
+
+    modes = [
+        ("undecorated",              work),
+        ("disabled",                 sampled("bench.disabled", enabled=False)(work)),
+        ("sampled 1/1000",           sampled("bench.1000", every=1000)(work)),
+        ("sampled 1/100",            sampled("bench.100", every=100)(work)),
+        ("sampled every call",       sampled("bench.1", every=1)(work)),
+        ("sampled 1 per 0.1 s",      sampled("bench.window", interval=0.1)(work)),
+        ("Timer(logger=None)",       Timer(logger=None)(work)),
+    ]
+    loop = range(args.calls)
+    baseline = None
+    for label, func in modes:
+        best = None
+        for _ in range(args.repeat):
+            tic = time.perf_counter_ns()
+            for i in loop:
+                func(i)
+            elapsed = time.perf_counter_ns() - tic
+            best = elapsed if best is None else min(best, elapsed)
+        per_call = best / args.calls
+        baseline = per_call if baseline is None else baseline
+        print(f"{label:<22} {per_call:8.1f} ns/call  overhead {per_call - baseline:+8.1f} ns")
+    flush()
+    print({name: entry["count"] for name, entry in registry.snapshot().items() if name.startswith("bench.")})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import signal
+import sys
+import threading
+import time
+from contextlib import ContextDecorator
+from types import FrameType
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+"""
+-Sampler is a statistical profiler used like Timer, as a context manager or decorator:
+     with Sampler(interval=0.005) as sampler:
+         sorting.bubble_sort(data)
+     sampler.write("bubble.folded")      # flamegraph.pl bubble.folded > bubble.svg, or load into speedscope
+-Every 'interval' seconds the stacks of the sampled threads are recorded as folded stacks
+ with one "function (file:first line)" label per frame, root first:
+     <module> (bench.py:1);wrapper (sorting.py:38);bubble_sort (sorting.py:89) 12
+ The profiled code itself is not instrumented, so the cost
+ is per sample, not per call: doubling interval halves the overhead. overhead_ns/overhead gives the
+ time spent sampling.
+-mode="thread" (default) samples from a background thread with sys._current_frames(), which sees every
+ thread; all_threads=False keeps only the thread that started the sampler.
+ The sampling thread needs the GIL, which a busy thread only hands over every sys.getswitchinterval()
+ (5 ms by default), so in this mode samples of pure-Python hot loops come at most that often.
+ mode="signal" uses signal.setitimer(ITIMER_PROF), which only interrupts the main thread and only
+ counts CPU time, so it cannot be used from other threads or on Windows.
+-Memory is bounded: at most max_stacks distinct stacks are kept, frames beyond max_depth are cut from
+ the root end, and samples of new stacks past the limit are counted in .dropped.
+-folded(), write(), top() and report() work on snapshot(), so they can be called while sampling goes on.
+"""
+
+class Sampler(ContextDecorator):
+    def __init__(self, interval: float = 0.001, mode: str = "thread", all_threads: bool = True,
+                 max_stacks: int = 10_000, max_depth: int = 128) -> None:
+        if mode not in ("thread", "signal"):
+            raise ValueError(f"Unknown mode {mode!r}, use 'thread' or 'signal'")
+        self.interval = interval
+        self.mode = mode
+        self.all_threads = all_threads
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.stacks: Dict[str, int] = {}  # Folded stack -> samples
+        self.samples = 0
+        self.dropped = 0                   # Samples of stacks that did not fit in max_stacks
+        self.overhead_ns = 0               # Time spent taking samples
+        self._names: Dict[Any, str] = {}   # Code object -> frame label, so labels are built once
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target: Optional[int] = None
+        self._previous_handler: Any = None
+        self._start_time: Optional[int] = None
+        self.elapsed_ns = 0
+
+    # ========
+    # Sampling
+    # ========
+    def _label(self, frame: FrameType) -> str:
+        code = frame.f_code
+        label = self._names.get(code)
+        if label is None:
+            label = self._names[code] = f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+        return label
+
+    def _record(self, frame: Optional[FrameType]) -> None:
+        labels: List[str] = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(self._label(frame))
+            frame = frame.f_back
+        key = ";".join(reversed(labels))
+        count = self.stacks.get(key)
+        if count is not None:
+            self.stacks[key] = count + 1
+        elif len(self.stacks) < self.max_stacks:
+            self.stacks[key] = 1
+        else:
+            self.dropped += 1
+        self.samples += 1
+
+    def _sample_threads(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            tic = time.perf_counter_ns()
+            frames = sys._current_frames()
+            if self.all_threads:
+                for ident, frame in frames.items():
+                    if ident != own:
+                        self._record(frame)
+            else:
+                self._record(frames.get(self._target))
+            del frames
+            self.overhead_ns += time.perf_counter_ns() - tic
+
+    def _on_signal(self, signum: int, frame: Optional[FrameType]) -> None:
+        tic = time.perf_counter_ns()
+        self._record(frame)
+        self.overhead_ns += time.perf_counter_ns() - tic
+
+    # =========================
+    # Context manager interface
+    # =========================
+    def start(self) -> None:
+        if self._start_time is not None:
+            raise RuntimeError("Sampler is running, use .stop() to stop it")
+        self._stop.clear()
+        self._target = threading.get_ident()
+        if self.mode == "signal":
+            if threading.current_thread() is not threading.main_thread():
+                raise RuntimeError("mode='signal' only works in the main thread, use mode='thread'")
+            self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self._thread = threading.Thread(target=self._sample_threads, name="Sampler", daemon=True)
+            self._thread.start()
+        self._start_time = time.perf_counter_ns()
+
+    def stop(self) -> None:
+        if self._start_time is None:
+            raise RuntimeError("Sampler is not running, use .start() to start it")
+        self.elapsed_ns += time.perf_counter_ns() - self._start_time
+        self._start_time = None
+        if self.mode == "signal":
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler)
+        else:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "Sampler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    # ========
+    # Results
+    # ========
+    @property
+    def overhead(self) -> float:
+        """Fraction of the profiled wall time spent sampling. In thread mode it runs in a separate
+           thread, so the profiled code only loses this when both compete for the GIL."""
+        return self.overhead_ns / self.elapsed_ns if self.elapsed_ns else 0.0
+
+    def snapshot(self) -> Dict[str, int]:
+        """Copy of .stacks that is safe to iterate while the sampler is still recording"""
+        # dict() copies in C without running Python code in between, so neither the sampling thread
+        # nor a signal handler can change .stacks halfway through. A lock would deadlock in signal mode:
+        # the handler runs in the thread that might hold it.
+        return dict(self.stacks)
+
+    def folded(self) -> str:
+        """Folded stacks, one 'frame;frame;frame count' line each, as read by flamegraph.pl and speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.snapshot().items()))
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            f.write(self.folded())
+
+    def top(self, limit: int = 10) -> List[Tuple[str, int, int]]:
+        """(frame, self samples, total samples) of the frames with the most self samples"""
+        own: Dict[str, int] = {}
+        total: Dict[str, int] = {}
+        for stack, count in self.snapshot().items():
+            frames = stack.split(";")
+            own[frames[-1]] = own.get(frames[-1], 0) + count
+            for frame in set(frames):
+                total[frame] = total.get(frame, 0) + count
+        ranked = sorted(own.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(frame, count, total[frame]) for frame, count in ranked]
+
+    def report(self, limit: int = 10) -> str:
+        lines = [f"{self.samples} samples ({self.dropped} dropped) over {self.elapsed_ns / 1e9:0.3f} s, "
+                 f"sampling took {self.overhead_ns / 1e6:0.3f} ms ({100 * self.overhead:0.2f}%)",
+                 f"{'self':>8} {'total':>8}  frame"]
+        for frame, count, cumulative in self.top(limit):
+            lines.append(f"{100 * count / (self.samples or 1):7.1f}% {100 * cumulative / (self.samples or 1):7.1f}%  {frame}")
+        return "\n".join(lines)
+
+# =========
+# Benchmark
+# =========
+def main(argv: Sequence[str] = None) -> int:
+    import argparse
+    import random
+    import sorting
+
+    parser = argparse.ArgumentParser(description="Sampling profiler overhead on bubble_sort at several intervals")
+    parser.add_argument("--size", type=int, default=2000, help="Items to bubble sort")
+    parser.add_argument("--intervals", default="0.01,0.001,0.0002", help="Comma separated sampling intervals in seconds")
+    parser.add_argument("--mode", default="thread", choices=("thread", "signal"))
+    parser.add_argument("--out", default=None, help="Write the folded stacks of the last run here")
+    args = parser.parse_args(argv)
+
+    data = [random.random() for _ in range(args.size)]
+    tic = time.perf_counter()
+    sorting.bubble_sort(data.copy())
+    plain = time.perf_counter() - tic
+    print(f"bubble_sort({args.size}) without profiler: {plain:0.4f} s")
+
+    sampler = None
+    for interval in (float(s) for s in args.intervals.split(",")):
+        sampler = Sampler(interval=interval, mode=args.mode)
+        with sampler:
+            sorting.bubble_sort(data.copy())
+        slowdown = sampler.elapsed_ns / 1e9 / plain
+        print(f"interval {interval:g} s: {sampler.elapsed_ns / 1e9:0.4f} s ({slowdown:0.2f}x), {sampler.samples} samples")
+    print(sampler.report(5))
+    if args.out:
+        sampler.write(args.out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
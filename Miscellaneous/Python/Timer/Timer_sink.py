@@ -0,0 +1,194 @@
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+from typing import Any, List, Sequence, TextIO, Tuple, Union
+
+from .Timer_registry import Registry
+
+"""
+-LogSink takes timer output off the hot path: record(name, ns, text) only puts a tuple on a queue.SimpleQueue,
+ a background thread formats the records and writes them in batches to a file or stream.
+     sink = LogSink("timings.jsonl")
+     with Timer(name="query", sink=sink): ...
+-fmt="jsonl" writes {"name": ..., "ns": ...} per line, fmt="text" writes "name: 0.000123 seconds",
+ or text.format(seconds) when a text template is given (unnamed Timers pass their 'text').
+ Names are never used as format strings, so a name like "load {name}" is written as it is.
+-At most 'capacity' records wait in the queue. When it is full, policy="drop" throws the record away
+ and counts it in .dropped, policy="block" makes the caller wait until the writer has caught up.
+ Records arriving after close() are dropped and counted in .dropped too.
+-Everything still queued is written when close() is called, on 'with LogSink(...)' exit and at interpreter exit.
+ A record that can't be formatted or written is counted in .failed and the writer carries on with the next ones.
+ .written, .dropped and .failed count records; the counters are sharded per thread so they stay exact without a lock.
+"""
+
+_STOP = object()
+
+class LogSink:
+    def __init__(self, target: Union[str, TextIO] = sys.stdout, fmt: str = "jsonl", capacity: int = 100_000,
+                 policy: str = "drop", batch: int = 1024, flush_interval: float = 0.1) -> None:
+        if fmt not in ("jsonl", "text"):
+            raise ValueError(f"Unknown format {fmt!r}, use 'jsonl' or 'text'")
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown policy {policy!r}, use 'drop' or 'block'")
+        self.fmt = fmt
+        self.capacity = capacity
+        self.policy = policy
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self._owns_stream = isinstance(target, str)
+        self._stream: TextIO = open(target, "a") if self._owns_stream else target
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._room = threading.Event()  # Set by the writer after it has taken records off a full queue
+        self._counters = Registry()
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_loop, name="LogSink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # =========
+    # Hot path
+    # =========
+    def record(self, name: str, ns: int, text: str = None) -> None:
+        """Queue one timing, never formats or writes anything itself. text is an optional format template for the seconds."""
+        if self._closed:
+            self._counters.add("dropped")
+            return
+        if self._queue.qsize() >= self.capacity:
+            if self.policy == "drop":
+                self._counters.add("dropped")
+                return
+            while self._queue.qsize() >= self.capacity and self._thread.is_alive():
+                self._room.clear()
+                self._room.wait(self.flush_interval)
+        self._queue.put((name, ns, text))
+
+    # =======
+    # Writer
+    # =======
+    def _format(self, name: str, ns: int, text: str) -> str:
+        if self.fmt == "jsonl":
+            return json.dumps({"name": name, "ns": ns})
+        seconds = ns / 1e9
+        return text.format(seconds) if text is not None else f"{name}: {seconds:0.6f} seconds"
+
+    def _write(self, batch: List[Tuple[str, int, str]]) -> None:
+        # One bad record (a template that doesn't format, an unserializable name) must not stop the writer
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self._format(*record) + "\n")
+            except Exception:
+                self._counters.add("failed")
+        try:
+            self._stream.write("".join(lines))
+            self._stream.flush()
+        except Exception:
+            self._counters.add("failed", len(lines))
+            return
+        self._counters.add("written", len(lines))
+
+    def _write_loop(self) -> None:
+        get = self._queue.get
+        while True:
+            try:
+                item = get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch: List[Tuple[str, int, str]] = []
+            stop = item is _STOP
+            if not stop:
+                batch.append(item)
+            # Take whatever else is already waiting, up to a batch
+            while not stop and len(batch) < self.batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+            self._room.set()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    # ========
+    # Control
+    # ========
+    @property
+    def dropped(self) -> int:
+        entry = self._counters.snapshot().get("dropped")
+        return entry["count"] if entry else 0
+
+    @property
+    def written(self) -> int:
+        entry = self._counters.snapshot().get("written")
+        return int(entry["total"]) if entry else 0
+
+    @property
+    def failed(self) -> int:
+        entry = self._counters.snapshot().get("failed")
+        return int(entry["total"]) if entry else 0
+
+    def close(self) -> None:
+        """Write everything still queued and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        # Records queued by a record() that started just before close() came after _STOP
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._counters.add("dropped")
+        if self._owns_stream:
+            self._stream.close()
+        atexit.unregister(self.close)
+
+    def __enter__(self) -> "LogSink":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+# =========
+# Benchmark
+# =========
+def main(argv: Sequence[str] = None) -> int:
+    import argparse
+    import os
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Cost per record of print() against LogSink")
+    parser.add_argument("--records", type=lambda s: int(float(s)), default=10**5)
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.mkdtemp(), "timings.log")
+    with open(path, "w") as f:
+        tic = time.perf_counter_ns()
+        for i in range(args.records):
+            print("Elapsed time: {:0.6f} seconds".format(i / 1e9), file=f)
+        direct = time.perf_counter_ns() - tic
+
+    for policy in ("drop", "block"):
+        sink = LogSink(path, fmt="text", capacity=10_000, policy=policy)
+        tic = time.perf_counter_ns()
+        for i in range(args.records):
+            sink.record("bench", i, "Elapsed time: {:0.6f} seconds")
+        queued = time.perf_counter_ns() - tic
+        sink.close()
+        print(f"LogSink ({policy}): {queued / args.records:0.0f} ns/record on the caller, "
+              f"{sink.written} written, {sink.dropped} dropped, {sink.failed} failed")
+    print(f"print() to a file:   {direct / args.records:0.0f} ns/record")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
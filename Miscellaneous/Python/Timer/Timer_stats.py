@@ -0,0 +1,135 @@
+from array import array
+from math import sqrt
+from typing import Dict, List, Optional, Tuple
+
+"""
+-Streaming statistics for timing samples given as integer nanoseconds (time.perf_counter_ns()).
+-Memory use is constant no matter how many samples are added:
+ count, mean and variance are updated with Welford's algorithm, min and max are kept directly,
+ percentiles come from a fixed log-bucket histogram and the most recent samples sit in a ring buffer.
+-Histogram buckets split every power of two into SUB_BUCKETS linear steps, so a percentile is
+ within about 1/SUB_BUCKETS (~6%) of the true sample value.
+"""
+
+SUB_BITS    = 4
+SUB_BUCKETS = 1 << SUB_BITS                      # Linear steps per power of two
+BUCKETS     = (64 - SUB_BITS) * SUB_BUCKETS      # Enough for any non-negative int64
+
+def bucket_index(ns: int) -> int:
+    """Histogram bucket of a sample, values below 2 * SUB_BUCKETS get a bucket each"""
+    if ns < 2 * SUB_BUCKETS:
+        return max(ns, 0)
+    shift = ns.bit_length() - (SUB_BITS + 1)
+    return (shift + 1) * SUB_BUCKETS + (ns >> shift) - SUB_BUCKETS
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """Smallest value in a bucket and the bucket width"""
+    if index < 2 * SUB_BUCKETS:
+        return index, 1
+    shift = index // SUB_BUCKETS - 1
+    return (index % SUB_BUCKETS + SUB_BUCKETS) << shift, 1 << shift
+
+class TimingStats:
+    def __init__(self, capacity: int = 1000) -> None:
+        self.capacity = capacity                        # Size of the ring buffer of recent samples
+        self.count    = 0
+        self.mean     = 0.0                             # Running mean in ns
+        self._m2      = 0.0                             # Sum of squared distances from the mean (Welford)
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        self.total    = 0                               # Sum of all samples in ns
+        self._histogram = array("q", bytes(8 * BUCKETS))
+        self._recent    = array("q", bytes(8 * capacity))
+
+    def add(self, ns: int) -> None:
+        """Record one sample in nanoseconds"""
+        if self.capacity:
+            self._recent[self.count % self.capacity] = ns
+        self.count += 1
+        self.total += ns
+        delta = ns - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (ns - self.mean)
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if self.max is None or ns > self.max:
+            self.max = ns
+        self._histogram[bucket_index(ns)] += 1
+
+    def merge(self, other: "TimingStats") -> None:
+        """Fold another TimingStats into this one (Chan et al. parallel variance)"""
+        if not other.count:
+            return
+        if self.capacity:
+            # Other's recent samples go in as if they had just been added one by one
+            recent = other.recent()
+            position = self.count + other.count - len(recent)
+            for ns in recent:
+                self._recent[position % self.capacity] = ns
+                position += 1
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        for i, n in enumerate(other._histogram):
+            if n:
+                self._histogram[i] += n
+
+    @property
+    def variance(self) -> float:
+        """Sample variance in ns squared"""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        return sqrt(self.variance)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Approximate p-th percentile (0-100) in ns, None without samples"""
+        if not self.count:
+            return None
+        rank = max(1, -(-p * self.count // 100))  # ceil, at least the first sample
+        seen = 0
+        for index, n in enumerate(self._histogram):
+            seen += n
+            if seen >= rank:
+                low, width = bucket_bounds(index)
+                # Middle of the bucket, but never outside the range actually seen
+                return min(max(low + (width - 1) / 2, self.min), self.max)
+        return float(self.max)
+
+    def recent(self) -> List[int]:
+        """The most recent samples (at most capacity of them), oldest first"""
+        if not self.capacity:
+            return []
+        if self.count <= self.capacity:
+            return self._recent[:self.count].tolist()
+        start = self.count % self.capacity
+        return (self._recent[start:] + self._recent[:start]).tolist()
+
+    def summary(self) -> Dict[str, float]:
+        """Statistics in seconds"""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "total": self.total / 1e9,
+            "mean":  self.mean / 1e9,
+            "stdev": self.stdev / 1e9,
+            "min":   self.min / 1e9,
+            "p50":   self.percentile(50) / 1e9,
+            "p90":   self.percentile(90) / 1e9,
+            "p99":   self.percentile(99) / 1e9,
+            "max":   self.max / 1e9,
+        }
+
+    def __str__(self) -> str:
+        s = self.summary()
+        if not self.count:
+            return "no samples"
+        return (f"n={s['count']} mean={s['mean']:0.6f} stdev={s['stdev']:0.6f} min={s['min']:0.6f} "
+                f"p50={s['p50']:0.6f} p90={s['p90']:0.6f} p99={s['p99']:0.6f} max={s['max']:0.6f} seconds")
@@ -0,0 +1,230 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Sequence, TextIO, Tuple, Union
+
+from .Timer_registry import Registry
+
+"""
+-TraceSink records when timed blocks begin and end, per thread, and writes them as a Chrome Trace Event
+ file that chrome://tracing and ui.perfetto.dev show as a timeline with nested spans:
+     spans = TraceSink("trace.json")
+     with Timer(name="main", spans=spans):
+         with Timer(name="fib1", spans=spans): fib1(30)
+     spans.close()
+-begin(name)/end(name) only put a ("B"/"E", name, thread id, ns) tuple into a preallocated ring of 'capacity'
+ slots, under a lock held for a few list stores. A background thread takes everything waiting every
+ 'flush_interval' seconds and appends it to the file as JSON in one write.
+-Nesting comes from the timestamps: a span that begins after another one on the same thread and ends before it
+ is drawn inside it, whether the Timers are nested with 'with' blocks or by decorated functions calling each other.
+-The ring is bounded. begin() reserves the slot of its end event too, so a span is either written whole or
+ dropped whole and the timeline never has a begin without its end. When the ring has no room for both,
+ begin() returns False, the span is counted in .dropped and the matching end() must be skipped
+ (Timer does that). .written counts events written, .failed events that could not be written.
+-The file is a JSON array; everything still in the ring is written and the array closed on close(),
+ on 'with TraceSink(...)' exit and at interpreter exit. Timestamps are microseconds since the sink was made.
+"""
+
+class TraceSink:
+    def __init__(self, target: Union[str, TextIO], capacity: int = 65_536, flush_interval: float = 0.1) -> None:
+        if capacity < 2:
+            raise ValueError("capacity must hold at least one span (2 events)")
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self._owns_stream = isinstance(target, str)
+        self._stream: TextIO = open(target, "w") if self._owns_stream else target
+        self._slots: List[Any] = [None] * capacity  # Ring of events, _head is the oldest, _count are waiting
+        self._head = 0
+        self._count = 0
+        self._reserved = 0  # End events of begun spans that are not in the ring yet
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._threads: Dict[int, str] = {}  # Thread ids already named in the file
+        self._names: Dict[str, str] = {}    # Span name -> its JSON string
+        self._first = True
+        self._counters = Registry()
+        self._closed = False
+        self._wake = threading.Event()
+        self._stream.write("[")
+        self._thread = threading.Thread(target=self._write_loop, name="TraceSink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # =========
+    # Hot path
+    # =========
+    def begin(self, name: str) -> bool:
+        """Record the start of a span on this thread. False if it was dropped, then don't call end()."""
+        now = time.perf_counter_ns()
+        with self._lock:
+            if self._closed or self._count + self._reserved + 2 > self.capacity:
+                dropped = True
+            else:
+                dropped = False
+                self._slots[(self._head + self._count) % self.capacity] = ("B", name, threading.get_ident(), now)
+                self._count += 1
+                self._reserved += 1
+        if dropped:
+            self._counters.add("dropped")
+        return not dropped
+
+    def end(self, name: str) -> None:
+        """Record the end of a span begun on this thread, its slot was reserved by begin()"""
+        now = time.perf_counter_ns()
+        with self._lock:
+            self._slots[(self._head + self._count) % self.capacity] = ("E", name, threading.get_ident(), now)
+            self._count += 1
+            self._reserved -= 1
+
+    # =======
+    # Writer
+    # =======
+    def _take(self) -> List[Tuple[str, str, int, int]]:
+        """Everything waiting in the ring, oldest first"""
+        with self._lock:
+            head, count = self._head, self._count
+            end = head + count
+            if end <= self.capacity:
+                events = self._slots[head:end]
+            else:
+                events = self._slots[head:] + self._slots[:end - self.capacity]
+            self._head = end % self.capacity
+            self._count = 0
+        return events
+
+    def _format(self, phase: str, name: str, tid: int, ns: int) -> str:
+        # The same few names come back all the time, each is JSON-encoded once
+        encoded = self._names.get(name)
+        if encoded is None:
+            encoded = self._names[name] = json.dumps(name)
+        return f'{{"name": {encoded}, "ph": "{phase}", "ts": {(ns - self._origin) / 1e3:.3f}, "pid": {self._pid}, "tid": {tid}}}'
+
+    def _write(self, events: List[Tuple[str, str, int, int]]) -> None:
+        lines = []
+        # Metadata events give the threads their names in the viewer
+        for tid in {event[2] for event in events} - self._threads.keys():
+            thread = next((t for t in threading.enumerate() if t.ident == tid), None)
+            self._threads[tid] = thread.name if thread is not None else str(tid)
+            lines.append(json.dumps({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                                     "args": {"name": self._threads[tid]}}))
+        written = 0
+        for event in events:
+            try:
+                lines.append(self._format(*event))
+                written += 1
+            except Exception:
+                self._counters.add("failed")
+        if not lines:
+            return
+        text = ("\n" if self._first else ",\n") + ",\n".join(lines)
+        try:
+            self._stream.write(text)
+            self._stream.flush()
+        except Exception:
+            self._counters.add("failed", written)
+            return
+        self._first = False
+        self._counters.add("written", written)
+
+    def _write_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            events = self._take()
+            if events:
+                self._write(events)
+        # Spans still open at close() are written without their end
+        self._write(self._take())
+
+    # ========
+    # Control
+    # ========
+    @property
+    def dropped(self) -> int:
+        entry = self._counters.snapshot().get("dropped")
+        return entry["count"] if entry else 0
+
+    @property
+    def written(self) -> int:
+        entry = self._counters.snapshot().get("written")
+        return int(entry["total"]) if entry else 0
+
+    @property
+    def failed(self) -> int:
+        entry = self._counters.snapshot().get("failed")
+        return int(entry["total"]) if entry else 0
+
+    def close(self) -> None:
+        """Write everything still in the ring, close the JSON array and stop the writer thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self._stream.write("\n]\n")
+        self._stream.flush()
+        if self._owns_stream:
+            self._stream.close()
+        atexit.unregister(self.close)
+
+    def __enter__(self) -> "TraceSink":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+# =========
+# Benchmark
+# =========
+def main(argv: Sequence[str] = None) -> int:
+    import argparse
+    import tempfile
+    from .Timer_class import Timer
+
+    parser = argparse.ArgumentParser(description="Cost per span of a Timer with and without a TraceSink, and a sample trace")
+    parser.add_argument("--spans", type=lambda s: int(float(s)), default=10**5)
+    parser.add_argument("--capacity", type=int, default=65_536)
+    parser.add_argument("--output", default=os.path.join(tempfile.mkdtemp(), "trace.json"))
+    args = parser.parse_args(argv)
+
+    plain = Timer(name="plain", logger=None)
+    tic = time.perf_counter_ns()
+    for _ in range(args.spans):
+        with plain:
+            pass
+    without = time.perf_counter_ns() - tic
+
+    with TraceSink(args.output, capacity=args.capacity) as spans:
+        timer = Timer(name="span", logger=None, spans=spans)
+        tic = time.perf_counter_ns()
+        for _ in range(args.spans):
+            with timer:
+                pass
+        traced = time.perf_counter_ns() - tic
+
+        # Nested spans on two threads, to look at in a viewer
+        def work(label: str) -> None:
+            with Timer(name=label, logger=None, spans=spans):
+                for part in range(3):
+                    with Timer(name=f"{label}.part{part}", logger=None, spans=spans):
+                        sum(i * i for i in range(20_000))
+        threads = [threading.Thread(target=work, args=(f"worker{i}",), name=f"worker{i}") for i in range(2)]
+        with Timer(name="main", logger=None, spans=spans):
+            for thread in threads:
+                thread.start()
+            work("main.work")
+            for thread in threads:
+                thread.join()
+
+    print(f"Timer without spans: {without / args.spans:0.0f} ns/run, with a TraceSink: {traced / args.spans:0.0f} ns/run")
+    print(f"{spans.written} events written, {spans.dropped} spans dropped, {spans.failed} failed -> {args.output}")
+    with open(args.output) as f:
+        print(f"{len(json.load(f))} events in the file, open it in ui.perfetto.dev or chrome://tracing")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
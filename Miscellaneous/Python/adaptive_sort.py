@@ -0,0 +1,151 @@
+# Adaptive sort dispatcher
+# ========================
+"""
+-sort(array) picks one of the sorting engines in this folder from a cheap probe of the input:
+ length, how presorted it is (fraction of descents between sampled neighbours), duplicate ratio,
+ and whether it looks like integers from a range small enough for counting_sort.
+-The probe looks at no more than PROBE_SIZE sampled positions, so its cost does not grow with the input.
+-plan(array) returns the decision without sorting, sort(array, return_plan=True) returns (array, plan).
+-Like introsort, the result is not guaranteed to be stable, use bottom_up_merge_sort when it has to be.
+ With key= or reverse= the result is stable: the keys are computed once, probed instead of the items,
+ and a list of positions is sorted by key so equal keys keep their input order.
+
+command line example (benchmark against every single engine over the standard input shapes):
+python adaptive_sort.py --size 1e5
+"""
+import argparse
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+
+import sorting
+from integer_sort import COUNTING_RANGE_LIMIT, counting_sort
+
+PROBE_SIZE = 1024      # Most positions the probe samples
+PROBE_FRACTION = 16    # ...and never more than one in every PROBE_FRACTION items, so small inputs stay cheap
+SMALL_SIZE = 32        # At or below this length insertion_sort wins
+PRESORTED_RATIO = 0.05 # Descent ratio below this (or above 1 - this) counts as mostly sorted or reversed
+DENSE_FACTOR = 4       # Integers spanning at most DENSE_FACTOR * n values go to counting_sort
+
+ENGINES: Dict[str, Callable[[List[Any]], Any]] = {
+    "none":                 lambda array, **kwargs: array,
+    "insertion_sort":       sorting.insertion_sort,
+    "bottom_up_merge_sort": sorting.bottom_up_merge_sort,
+    "counting_sort":        counting_sort,
+    "introsort":            sorting.introsort,
+}
+
+@dataclass
+class SortPlan:
+    engine:          str                          # Key into ENGINES
+    length:          int   = 0
+    descent_ratio:   float = 0.0                  # Fraction of sampled neighbours that are out of order
+    duplicate_ratio: float = 0.0                  # 1 - distinct / sampled
+    int_range:       int   = 0                    # max - min of the sampled ints, 0 if the items are not all ints
+    range_limit:     int   = 0                    # counting_sort: largest real max - min + 1 it may take on, checked on every item
+    probe_ns:        int   = 0                    # Time spent probing
+    reasons:         List[str] = field(default_factory=list)
+
+def probe(array: Sequence[Any]) -> SortPlan:
+    """Sample the input and describe it, the engine field is filled in by plan()"""
+    tic = time.perf_counter_ns()
+    n = len(array)
+    result = SortPlan(engine="none", length=n)
+    if n >= 2:
+        # Evenly spaced neighbour pairs (i, i+1)
+        samples = min(PROBE_SIZE, max(n // PROBE_FRACTION, SMALL_SIZE))
+        step = max((n - 1) // samples, 1)
+        positions = range(0, n - 1, step)
+        descents = sum(1 for i in positions if array[i + 1] < array[i])
+        result.descent_ratio = descents / len(positions)
+
+        sample = [array[i] for i in positions]
+        if all(type(x) is int for x in sample):
+            result.int_range = max(sample) - min(sample)
+            result.duplicate_ratio = 1 - len(set(sample)) / len(sample)
+        else:
+            try:
+                result.duplicate_ratio = 1 - len(set(sample)) / len(sample)
+            except TypeError:
+                # Unhashable items, duplicates cannot be counted cheaply
+                pass
+    result.probe_ns = time.perf_counter_ns() - tic
+    return result
+
+def plan(array: Sequence[Any]) -> SortPlan:
+    """Choose the engine for array"""
+    result = probe(array)
+    n = result.length
+    if n < 2:
+        result.engine = "none"
+        result.reasons.append("fewer than 2 items")
+    elif n <= SMALL_SIZE:
+        result.engine = "insertion_sort"
+        result.reasons.append(f"at most {SMALL_SIZE} items")
+    elif result.descent_ratio <= PRESORTED_RATIO or result.descent_ratio >= 1 - PRESORTED_RATIO:
+        result.engine = "bottom_up_merge_sort"
+        result.reasons.append(f"descent ratio {result.descent_ratio:0.3f}, long natural runs")
+    elif result.int_range and result.int_range <= min(DENSE_FACTOR * n, COUNTING_RANGE_LIMIT):
+        result.engine = "counting_sort"
+        result.range_limit = min(DENSE_FACTOR * n, COUNTING_RANGE_LIMIT - 1) + 1
+        result.reasons.append(f"ints spanning about {result.int_range} values")
+    else:
+        result.engine = "introsort"
+        result.reasons.append(f"duplicate ratio {result.duplicate_ratio:0.3f}, no exploitable structure")
+    return result
+
+def _run(chosen: SortPlan, array: List[Any], **kwargs: Any) -> None:
+    try:
+        if chosen.engine == "counting_sort":
+            # The sample's range was dense, counting_sort checks the real one in its min/max pass
+            ENGINES[chosen.engine](array, range_limit=chosen.range_limit, **kwargs)
+        else:
+            ENGINES[chosen.engine](array, **kwargs)
+    except (TypeError, ValueError) as error:
+        # The probe only saw a sample: an item outside the sampled int range or type ends up here
+        if chosen.engine != "counting_sort":
+            raise
+        chosen.reasons.append(f"counting_sort refused the input ({error}), fell back to introsort")
+        chosen.engine = "introsort"
+        sorting.introsort(array, **kwargs)
+
+def sort(array: List[Any], return_plan: bool = False, key: Callable[[Any], Any] = None,
+         reverse: bool = False) -> Union[List[Any], Tuple[List[Any], SortPlan]]:
+    """Sort array in place with the engine plan() picks, returns array (and the plan if return_plan)"""
+    if key is None and not reverse:
+        chosen = plan(array)
+        _run(chosen, array)
+    else:
+        keys = [key(item) for item in array] if key is not None else list(array)
+        chosen = plan(keys)
+        positions = list(range(len(array)))
+        _run(chosen, positions, key=keys.__getitem__, reverse=reverse)
+        items = list(array)
+        array[:] = [items[i] for i in positions]
+    return (array, chosen) if return_plan else array
+
+# =========
+# Benchmark
+# =========
+def main(argv: Sequence[str] = None) -> int:
+    import sort_bench
+
+    parser = argparse.ArgumentParser(description="Compare sort() with every single engine")
+    parser.add_argument("--size", type=lambda s: int(float(s)), default=10**5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    singles = [name for name in ENGINES if name != "none"] + ["merge_sort", "quicksort", "radix_sort"]
+    for shape in sort_bench.SHAPES:
+        rows = sort_bench.run_suite(singles + ["adaptive_sort"], [args.size], [shape], args.repeat, logger=None)
+        best = min((row for row in rows if row["algorithm"] != "adaptive_sort"), key=lambda row: row["min_s"])
+        adaptive = next(row for row in rows if row["algorithm"] == "adaptive_sort")
+        chosen = plan(sort_bench.SHAPES[shape](args.size, random.Random(0)))
+        print(f"{shape:>14}: sort() {adaptive['min_s']:0.6f} s via {chosen.engine} (probe {chosen.probe_ns / 1e3:0.1f} us), "
+              f"best {best['algorithm']} {best['min_s']:0.6f} s, ratio {adaptive['min_s'] / best['min_s']:0.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
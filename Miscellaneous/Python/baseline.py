@@ -0,0 +1,227 @@
+# Benchmark baselines and regression checks
+# =========================================
+"""
+-Keeps the raw timing samples of the sorting.py and scratch_fibo.py benchmarks in a JSONL file,
+ one record per benchmark run, keyed by function, input parameters, interpreter and host fingerprint.
+ Records are only compared with records that have the same key, so results from another machine
+ or another Python version never count as a regression.
+-compare runs the benchmarks again and tests each one against the latest stored record with the same key:
+ Mann-Whitney U on the raw samples decides whether the two sets differ (p < --alpha), and a bootstrap
+ confidence interval of the ratio of the medians says by how much. A significant change larger than
+ --threshold is reported as a regression or a speedup, any regression makes the command exit with 1.
+-Noisy hosts need more samples: with --repeat 15 a difference of a few percent is usually detectable.
+
+command line example:
+python baseline.py record --suite sorting fibo --repeat 15
+python baseline.py compare --suite sorting fibo --repeat 15 --threshold 0.05
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import socket
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+STORE = "baselines.jsonl"
+
+# ============
+# Fingerprints
+# ============
+def interpreter() -> str:
+    return f"{platform.python_implementation()} {platform.python_version()} ({platform.python_compiler()})"
+
+def host() -> str:
+    """Short hash of what makes timings from one machine comparable"""
+    description = "|".join([socket.gethostname(), platform.machine(), platform.processor(),
+                            platform.system(), str(os.cpu_count())])
+    return hashlib.sha1(description.encode()).hexdigest()[:12]
+
+def key(record: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    return (record["function"], json.dumps(record["params"], sort_keys=True), record["interpreter"], record["host"])
+
+# =====
+# Store
+# =====
+def load(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save(records: Iterable[Dict[str, Any]], path: str) -> None:
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+
+def latest(records: Iterable[Dict[str, Any]], label: Optional[str] = None) -> Dict[Tuple[str, str, str, str], Dict[str, Any]]:
+    """Most recent record per key, only among records with 'label' if it is given"""
+    result = {}
+    for record in records:
+        if label is None or record.get("label") == label:
+            current = result.get(key(record))
+            if current is None or record["timestamp"] >= current["timestamp"]:
+                result[key(record)] = record
+    return result
+
+# ==========
+# Statistics
+# ==========
+def mann_whitney_u(a: Sequence[float], b: Sequence[float]) -> Tuple[float, float]:
+    """U statistic of a and two-sided p-value (normal approximation with tie correction)"""
+    n1, n2 = len(a), len(b)
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks = [0.0] * len(combined)
+    ties = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)  # With continuity correction
+    return u, min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+def bootstrap_ratio(base: Sequence[float], new: Sequence[float], iterations: int = 2000,
+                    confidence: float = 0.95, seed: int = 0) -> Tuple[float, float, float]:
+    """median(new) / median(base) and its bootstrap confidence interval (low, high)"""
+    rng = random.Random(seed)
+    ratios = []
+    for _ in range(iterations):
+        resampled_base = statistics.median(rng.choices(base, k=len(base)))
+        resampled_new = statistics.median(rng.choices(new, k=len(new)))
+        ratios.append(resampled_new / resampled_base)
+    ratios.sort()
+    tail = (1 - confidence) / 2
+    low = ratios[int(tail * (iterations - 1))]
+    high = ratios[int((1 - tail) * (iterations - 1))]
+    return statistics.median(new) / statistics.median(base), low, high
+
+def verdict(base: Sequence[float], new: Sequence[float], alpha: float = 0.01, threshold: float = 0.05) -> Dict[str, Any]:
+    """'regression', 'speedup' or 'same' for new samples against base samples"""
+    _, p = mann_whitney_u(base, new)
+    ratio, low, high = bootstrap_ratio(base, new)
+    result = "same"
+    if p < alpha:
+        if low > 1 + threshold:
+            result = "regression"
+        elif high < 1 - threshold:
+            result = "speedup"
+    return {"p": p, "ratio": ratio, "low": low, "high": high, "result": result}
+
+# ==========
+# Benchmarks
+# ==========
+def measure(func: Callable[..., Any], make_args: Callable[[], tuple], repeat: int) -> List[int]:
+    """Elapsed ns of 'repeat' calls, each with fresh arguments built outside the timed region.
+       One untimed call first, so the first sample doesn't carry cold caches."""
+    func(*make_args())
+    samples = []
+    for _ in range(repeat):
+        args = make_args()
+        tic = time.perf_counter_ns()
+        func(*args)
+        samples.append(time.perf_counter_ns() - tic)
+    return samples
+
+def sorting_suite(repeat: int) -> Iterable[Tuple[str, Dict[str, Any], List[int]]]:
+    import sort_bench
+
+    algorithms = ["merge_sort", "bottom_up_merge_sort", "quicksort", "introsort", "sorted"]
+    for row in sort_bench.run_suite(algorithms, sizes=[1000, 10000], shapes=["random", "nearly_sorted"],
+                                    repeat=repeat, logger=None):
+        yield f"sorting.{row['algorithm']}", {"shape": row["shape"], "size": row["size"]}, row["samples_ns"]
+
+def fibo_suite(repeat: int) -> Iterable[Tuple[str, Dict[str, Any], List[int]]]:
+    import fibonacci
+    import scratch_fibo
+
+    cases = [
+        ("scratch_fibo.fib1", scratch_fibo.fib1, 20),
+        ("scratch_fibo.fib2", scratch_fibo.fib2, 500),
+        ("fibonacci.fib",     fibonacci.fib,     10**5),
+    ]
+    for name, func, n in cases:
+        yield name, {"n": n}, measure(func, lambda: (n,), repeat)
+
+SUITES: Dict[str, Callable[[int], Iterable[Tuple[str, Dict[str, Any], List[int]]]]] = {
+    "sorting": sorting_suite,
+    "fibo":    fibo_suite,
+}
+
+def run(suites: Sequence[str], repeat: int, label: Optional[str]) -> List[Dict[str, Any]]:
+    records = []
+    for suite in suites:
+        for function, params, samples in SUITES[suite](repeat):
+            records.append({
+                "function":    function,
+                "params":      params,
+                "interpreter": interpreter(),
+                "host":        host(),
+                "label":       label,
+                "timestamp":   time.time(),
+                "samples_ns":  samples,
+            })
+    return records
+
+# ============
+# Command line
+# ============
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Record benchmark baselines and check for regressions against them")
+    parser.add_argument("command", choices=("record", "compare"))
+    parser.add_argument("--suite", nargs="+", choices=list(SUITES), default=list(SUITES))
+    parser.add_argument("--repeat", type=int, default=15, help="Samples per benchmark")
+    parser.add_argument("--store", default=STORE, help="JSONL file holding the baselines")
+    parser.add_argument("--label", default=None, help="Label saved with recorded runs")
+    parser.add_argument("--baseline-label", default=None, help="compare: only use stored records with this label")
+    parser.add_argument("--alpha", type=float, default=0.01, help="compare: significance level of the Mann-Whitney U test")
+    parser.add_argument("--threshold", type=float, default=0.05, help="compare: smallest relative change that counts")
+    parser.add_argument("--save", action="store_true", help="compare: also store the new run")
+    args = parser.parse_args(argv)
+
+    records = run(args.suite, args.repeat, args.label)
+    if args.command == "record":
+        save(records, args.store)
+        print(f"Stored {len(records)} records in {args.store}")
+        return 0
+
+    baselines = latest(load(args.store), args.baseline_label)
+    regressions = 0
+    print(f"{'benchmark':<62} {'base ms':>9} {'new ms':>9} {'change':>8} {'95% CI':>17} {'p':>8}  result")
+    for record in records:
+        name = f"{record['function']} {json.dumps(record['params'], sort_keys=True)}"
+        base = baselines.get(key(record))
+        new_median = statistics.median(record["samples_ns"]) / 1e6
+        if base is None:
+            print(f"{name:<62} {'':>9} {new_median:>9.3f} {'':>8} {'':>17} {'':>8}  no baseline")
+            continue
+        result = verdict(base["samples_ns"], record["samples_ns"], args.alpha, args.threshold)
+        regressions += result["result"] == "regression"
+        print(f"{name:<62} {statistics.median(base['samples_ns']) / 1e6:>9.3f} {new_median:>9.3f} "
+              f"{100 * (result['ratio'] - 1):>+7.1f}% [{100 * (result['low'] - 1):>+6.1f}%, {100 * (result['high'] - 1):>+6.1f}%] "
+              f"{result['p']:>8.4f}  {result['result']}")
+    if args.save:
+        save(records, args.store)
+    if regressions:
+        print(f"{regressions} regression(s)")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# External (out-of-core) sorting
+# ==============================
+"""
+-Sorts files that do not fit in memory, next to merge_sort it is the same idea at file scale:
+ 1. Split: stream the input in chunks of bounded size, sort each chunk in memory and spill it to a temporary run file
+ 2. Merge: memory-map every run file and k-way merge them with a heap, writing the output through a large buffer
+-Two file formats are supported:
+ 'binary' - fixed size items of an array typecode ('q' 64-bit ints by default), as written by array.tofile()
+ 'text'   - one record per line, compared as bytes or by a key function such as int
+-external_sort returns an ExternalSortStats with bytes read and written and the time spent in each phase.
+
+command line example:
+python external_sort.py numbers.txt sorted.txt --format text --numeric --chunk-mb 64
+python external_sort.py --generate 10000000 numbers.bin --format binary
+"""
+import argparse
+import heapq
+import mmap
+import os
+import random
+import sys
+import tempfile
+from array import array as typed_array
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+
+from Timer.Timer_class import Timer
+
+WRITE_BUFFER = 1 << 20  # Bytes buffered before each write of the output file
+
+@dataclass
+class ExternalSortStats:
+    runs:          int   = 0    # Number of sorted run files spilled during the split phase
+    items:         int   = 0    # Number of items (or lines) sorted
+    bytes_read:    int   = 0    # Input bytes plus run bytes read back during the merge
+    bytes_written: int   = 0    # Run bytes plus output bytes
+    split_time:    float = 0.0  # Seconds spent reading, sorting and spilling chunks
+    merge_time:    float = 0.0  # Seconds spent merging runs into the output
+
+    def __str__(self) -> str:
+        return (f"{self.items} items in {self.runs} runs, read {self.bytes_read} bytes, wrote {self.bytes_written} bytes, "
+                f"split: {self.split_time:0.6f} s, merge: {self.merge_time:0.6f} s")
+
+# =================
+# Split into runs
+# =================
+def _split_binary(src, typecode: str, chunk_bytes: int, tmp_dir: str, stats: ExternalSortStats) -> List[str]:
+    itemsize = typed_array(typecode).itemsize
+    chunk_items = max(chunk_bytes // itemsize, 1)
+    runs = []
+    while True:
+        chunk = typed_array(typecode)
+        try:
+            chunk.fromfile(src, chunk_items)
+        except EOFError:
+            # Last, partial chunk: fromfile keeps the items it did read
+            pass
+        if not chunk:
+            break
+        stats.bytes_read += len(chunk) * itemsize
+        stats.items += len(chunk)
+        # list.sort is the fastest in-memory sort available
+        chunk = typed_array(typecode, sorted(chunk))
+        runs.append(_spill(tmp_dir, lambda f: chunk.tofile(f), stats))
+    return runs
+
+def _split_text(src, key: Optional[Callable[[bytes], Any]], chunk_bytes: int, tmp_dir: str,
+                stats: ExternalSortStats) -> List[str]:
+    runs = []
+    while True:
+        # readlines with a size hint stops after roughly chunk_bytes
+        lines = src.readlines(chunk_bytes)
+        if not lines:
+            break
+        stats.bytes_read += sum(map(len, lines))
+        stats.items += len(lines)
+        if not lines[-1].endswith(b"\n"):
+            lines[-1] += b"\n"
+        lines.sort(key=key)
+        runs.append(_spill(tmp_dir, lambda f: f.writelines(lines), stats))
+    return runs
+
+def _spill(tmp_dir: str, write: Callable[[Any], None], stats: ExternalSortStats) -> str:
+    # Write one sorted run to a new temporary file, returns its path
+    fd, path = tempfile.mkstemp(prefix="run_", dir=tmp_dir)
+    with os.fdopen(fd, "wb") as f:
+        write(f)
+    stats.runs += 1
+    stats.bytes_written += os.path.getsize(path)
+    return path
+
+# ===========
+# Merge runs
+# ===========
+def _binary_items(mm: mmap.mmap, typecode: str) -> Iterator[Any]:
+    view = memoryview(mm).cast(typecode)
+    try:
+        yield from view
+    finally:
+        view.release()
+
+def _text_items(mm: mmap.mmap) -> Iterator[bytes]:
+    return iter(mm.readline, b"")
+
+def _merge_runs(runs: List[str], dst, fmt: str, typecode: str, key: Optional[Callable[[bytes], Any]],
+                stats: ExternalSortStats) -> None:
+    files, maps = [], []
+    try:
+        for path in runs:
+            f = open(path, "rb")
+            files.append(f)
+            maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            stats.bytes_read += len(maps[-1])
+
+        if fmt == "binary":
+            iterators = [_binary_items(mm, typecode) for mm in maps]
+            buffer = typed_array(typecode)
+            batch = max(WRITE_BUFFER // buffer.itemsize, 1)
+            for item in heapq.merge(*iterators):
+                buffer.append(item)
+                if len(buffer) >= batch:
+                    buffer.tofile(dst)
+                    del buffer[:]
+            buffer.tofile(dst)
+            # Close the generators so their memoryviews are released before the maps are closed
+            for it in iterators:
+                it.close()
+        else:
+            dst.writelines(heapq.merge(*[_text_items(mm) for mm in maps], key=key))
+    finally:
+        for mm in maps:
+            mm.close()
+        for f in files:
+            f.close()
+
+# ===========
+# Entry point
+# ===========
+def external_sort(in_path: str, out_path: str, fmt: str = "binary", typecode: str = "q",
+                  key: Optional[Callable[[bytes], Any]] = None, chunk_bytes: int = 64 << 20,
+                  tmp_dir: Optional[str] = None) -> ExternalSortStats:
+    """Sort in_path into out_path using at most about chunk_bytes of item data in memory at a time.
+       fmt is 'binary' (items of array typecode) or 'text' (lines, ordered by key if one is given)."""
+    if fmt not in ("binary", "text"):
+        raise ValueError(f"Unknown format {fmt!r}, use 'binary' or 'text'")
+
+    stats = ExternalSortStats()
+    timer = Timer(logger=None)
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as run_dir:
+        timer.start()
+        with open(in_path, "rb") as src:
+            if fmt == "binary":
+                runs = _split_binary(src, typecode, chunk_bytes, run_dir, stats)
+            else:
+                runs = _split_text(src, key, chunk_bytes, run_dir, stats)
+        stats.split_time = timer.stop()
+
+        timer.start()
+        with open(out_path, "wb", buffering=WRITE_BUFFER) as dst:
+            _merge_runs(runs, dst, fmt, typecode, key, stats)
+        stats.bytes_written += os.path.getsize(out_path)
+        stats.merge_time = timer.stop()
+    return stats
+
+def generate(path: str, count: int, fmt: str = "binary", typecode: str = "q", seed: int = 0) -> None:
+    """Write 'count' random integers to path, for trying out external_sort"""
+    rng = random.Random(seed)
+    with open(path, "wb", buffering=WRITE_BUFFER) as f:
+        for start in range(0, count, 1 << 16):
+            numbers = [rng.randint(0, 2**31) for _ in range(min(1 << 16, count - start))]
+            if fmt == "binary":
+                typed_array(typecode, numbers).tofile(f)
+            else:
+                f.write(b"".join(b"%d\n" % x for x in numbers))
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sort a file that may not fit in memory")
+    parser.add_argument("input")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--format", choices=["binary", "text"], default="binary")
+    parser.add_argument("--typecode", default="q", help="array typecode of binary items")
+    parser.add_argument("--numeric", action="store_true", help="Compare text lines as integers")
+    parser.add_argument("--chunk-mb", type=float, default=64)
+    parser.add_argument("--generate", type=lambda s: int(float(s)), metavar="COUNT",
+                        help="Write COUNT random integers to input instead of sorting")
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        generate(args.input, args.generate, args.format, args.typecode)
+        return 0
+    if not args.output:
+        parser.error("output is required when sorting")
+    stats = external_sort(args.input, args.output, args.format, args.typecode,
+                          key=int if args.numeric else None, chunk_bytes=int(args.chunk_mb * 2**20))
+    print(stats)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# Fibonacci engine
+# ================
+"""
+-scratch_fibo.fib1 is exponential and fib2 recurses once per step (RecursionError near n=1000).
+ The functions here are iterative, so n is only limited by memory for the big-int result.
+-fib:        fast doubling, O(log n) big-int multiplications
+             F(2k) = F(k) * (2F(k+1) - F(k)),  F(2k+1) = F(k)^2 + F(k+1)^2
+-fib_matrix: the same result from [[1, 1], [1, 0]]^n by repeated squaring, kept for comparison
+-fib_mod:    fast doubling with every step reduced mod m, so numbers stay small
+-fib_many:   many indices at once, walking through the sorted indices and only advancing by the gaps
+-fib_stream: generator over the whole sequence with O(1) state
+
+command line example (benchmark against scratch_fibo.fib1/fib2):
+python fibonacci.py
+"""
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from Timer import Timer_class
+
+STEP_LIMIT = 64  # Gaps shorter than this are walked one addition at a time instead of jumped
+
+def _check(n: int) -> None:
+    if n < 0:
+        raise ValueError(f"Fibonacci index must be non-negative, got {n}")
+
+def fib_pair(n: int, m: Optional[int] = None) -> Tuple[int, int]:
+    """(F(n), F(n+1)) by fast doubling, reduced mod m if m is given"""
+    _check(n)
+    a, b = 0, 1  # F(0), F(1)
+    for bit in bin(n)[2:]:
+        # (F(k), F(k+1)) -> (F(2k), F(2k+1))
+        c = a * (2 * b - a)
+        d = a * a + b * b
+        if bit == "1":
+            # -> (F(2k+1), F(2k+2))
+            c, d = d, c + d
+        if m is not None:
+            c, d = c % m, d % m
+        a, b = c, d
+    return a, b
+
+def fib(n: int) -> int:
+    return fib_pair(n)[0]
+
+def fib_mod(n: int, m: int) -> int:
+    if m < 1:
+        raise ValueError(f"Modulus must be positive, got {m}")
+    return fib_pair(n, m)[0] % m
+
+def fib_matrix(n: int) -> int:
+    _check(n)
+    # Matrices [[a, b], [b, c]] stay symmetric, so three numbers are enough
+    result = (1, 0, 1)  # identity
+    base = (1, 1, 0)    # [[F(2), F(1)], [F(1), F(0)]]
+    while n:
+        if n & 1:
+            a, b, c = result
+            x, y, z = base
+            result = (a * x + b * y, a * y + b * z, b * y + c * z)
+        x, y, z = base
+        base = (x * x + y * y, x * y + y * z, y * y + z * z)
+        n >>= 1
+    return result[1]
+
+def fib_many(ns: Iterable[int]) -> List[int]:
+    """F(n) for every n in ns, in the same order. The indices are visited in sorted order
+       and each one starts from the previous result, jumping over large gaps with
+       F(a+d) = F(a)F(d+1) + (F(a+1) - F(a))F(d) and F(a+d+1) = F(a+1)F(d+1) + F(a)F(d)."""
+    ns = list(ns)
+    results: Dict[int, int] = {}
+    index, a, b = 0, 0, 1  # a = F(index), b = F(index + 1)
+    for n in sorted(set(ns)):
+        _check(n)
+        gap = n - index
+        if gap < STEP_LIMIT:
+            for _ in range(gap):
+                a, b = b, a + b
+        else:
+            x, y = fib_pair(gap)
+            a, b = a * y + (b - a) * x, b * y + a * x
+        index = n
+        results[n] = a
+    return [results[n] for n in ns]
+
+def fib_stream(stop: Optional[int] = None) -> Iterator[int]:
+    """F(0), F(1), ... up to but not including F(stop), forever if stop is None"""
+    a, b = 0, 1
+    n = 0
+    while stop is None or n < stop:
+        yield a
+        a, b = b, a + b
+        n += 1
+
+# =========
+# Benchmark
+# =========
+def main() -> int:
+    from scratch_fibo import fib1, fib2
+
+    # Each function is wrapped in Timer_class.Timer, which runs it 'number' times and logs the minimum
+    cases = [
+        ("fib1",       fib1,       25),
+        ("fib2",       fib2,       900),
+        ("fib",        fib,        900),
+        ("fib_matrix", fib_matrix, 900),
+        ("fib",        fib,        10**6),
+        ("fib_matrix", fib_matrix, 10**6),
+    ]
+    for label, func, n in cases:
+        timed = Timer_class.Timer(text=f"{label}({n}): {{:0.6f}} seconds (best of 5)", number=5)(func)
+        timed(n)
+
+    ns = list(range(0, 20000, 7))
+    Timer_class.Timer(text=f"fib_many({len(ns)} indices): {{:0.6f}} seconds (best of 5)", number=5)(fib_many)(ns)
+    Timer_class.Timer(text=f"fib x {len(ns)} calls: {{:0.6f}} seconds (best of 5)",
+                      number=5)(lambda ns: [fib(n) for n in ns])(ns)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# Non-comparison sorts for integers
+# =================================
+"""
+-counting_sort: for integers spread over a small range (like the randint(0, 1000) data in sorting.py), O(n + range)
+-radix_sort:    LSD radix sort one byte at a time, for any integers that fit in 64 bits, O(n * bytes)
+-Both have the same call signature as bubble_sort/merge_sort: they sort the list in place and return it.
+-counting_sort(range_limit=...) lowers the largest max - min + 1 it accepts, above it ValueError is raised
+ after the one min/max pass, before any counting (adaptive_sort uses this to fall back when its sample missed an outlier).
+-With key= the items can be anything, key must return ints. Keys are computed once and the items are
+ distributed by key stably, so equal keys keep their input order (also with reverse=True).
+-The pure Python versions keep counts and intermediate results in compact 'array' module buffers.
+ When NumPy is installed a vectorized version is used instead, pass use_numpy=False to force pure Python.
+"""
+from array import array as typed_array
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+COUNTING_RANGE_LIMIT = 1 << 24  # Largest max - min + 1 counting_sort accepts, the count table is one int64 per value
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+def _bounds(array: List[int]) -> Tuple[int, int]:
+    # Min and max of array, checking every item is an int that fits in 64 bits
+    if any(type(x) is not int for x in array):
+        raise TypeError("Integer sorts only accept lists of int")
+    lo, hi = min(array), max(array)
+    if lo < INT64_MIN or hi > INT64_MAX:
+        raise ValueError("Integer sorts only accept values that fit in 64 bits")
+    return lo, hi
+
+def _want_numpy(use_numpy: Optional[bool]) -> bool:
+    if use_numpy and np is None:
+        raise ImportError("use_numpy=True but NumPy is not installed")
+    return np is not None if use_numpy is None else use_numpy
+
+def _sort_by_key(array: List[Any], key: Callable[[Any], int], reverse: bool, use_numpy: Optional[bool],
+                 order_by: Callable[[List[int], int], Sequence[int]]) -> List[Any]:
+    # Shared key= path: compute the keys once, find the stable order of their positions
+    # and rearrange the items to match
+    keys = [key(item) for item in array]
+    lo, hi = _bounds(keys)
+    if _want_numpy(use_numpy):
+        numbers = np.array(keys, dtype=np.int64)
+        if reverse:
+            # Stable ascending sort of the reversed keys, mapped back and reversed, is a stable descending sort
+            order = (len(keys) - 1 - np.argsort(numbers[::-1], kind="stable"))[::-1]
+        else:
+            order = np.argsort(numbers, kind="stable")
+        order = order.tolist()
+    else:
+        # Offsets from the smallest key, or from the largest one when descending
+        offsets = [hi - k for k in keys] if reverse else [k - lo for k in keys]
+        order = order_by(offsets, hi - lo)
+    array[:] = [array[i] for i in order]
+    return array
+
+# =============
+# Counting sort
+# =============
+def _counting_order(offsets: List[int], span: int, range_limit: int = COUNTING_RANGE_LIMIT) -> typed_array:
+    # Positions of offsets in stable sorted order, offsets lie in [0, span]
+    if span + 1 > range_limit:
+        raise ValueError(f"Range {span + 1} is too large for counting_sort, use radix_sort")
+    starts = typed_array("q", bytes(8 * (span + 2)))
+    for d in offsets:
+        starts[d + 1] += 1
+    for d in range(span + 1):
+        starts[d + 1] += starts[d]
+    order = typed_array("q", bytes(8 * len(offsets)))
+    for i, d in enumerate(offsets):
+        order[starts[d]] = i
+        starts[d] += 1
+    return order
+
+def counting_sort(array: List[Any], use_numpy: Optional[bool] = None,
+                  key: Optional[Callable[[Any], int]] = None, reverse: bool = False,
+                  range_limit: int = COUNTING_RANGE_LIMIT) -> List[Any]:
+    if len(array) < 2:
+        return array
+    range_limit = min(range_limit, COUNTING_RANGE_LIMIT)
+    if key is not None:
+        return _sort_by_key(array, key, reverse, use_numpy,
+                            lambda offsets, span: _counting_order(offsets, span, range_limit))
+    if reverse:
+        # Equal ints cannot be told apart, so there is no stability to keep
+        counting_sort(array, use_numpy, range_limit=range_limit)
+        array.reverse()
+        return array
+    lo, hi = _bounds(array)
+    size = hi - lo + 1
+    if size > range_limit:
+        raise ValueError(f"Range {size} is too large for counting_sort, use radix_sort")
+
+    if _want_numpy(use_numpy):
+        counts = np.bincount(np.array(array, dtype=np.int64) - lo, minlength=size)
+        array[:] = np.repeat(np.arange(lo, hi + 1, dtype=np.int64), counts).tolist()
+        return array
+
+    counts = typed_array("q", bytes(8 * size))
+    for x in array:
+        counts[x - lo] += 1
+    i = 0
+    for value, count in enumerate(counts, lo):
+        if count:
+            array[i:i + count] = [value] * count
+            i += count
+    return array
+
+# ==========
+# Radix sort
+# ==========
+RADIX_BITS = 8
+RADIX = 1 << RADIX_BITS
+RADIX_MASK = RADIX - 1
+
+def _radix_order(offsets: List[int], span: int) -> typed_array:
+    # Positions of offsets in stable sorted order, LSD radix passes over the positions
+    n = len(offsets)
+    passes = (span.bit_length() + RADIX_BITS - 1) // RADIX_BITS
+    src = typed_array("q", range(n))
+    dst = typed_array("q", bytes(8 * n))
+    for p in range(passes):
+        shift = p * RADIX_BITS
+        counts = typed_array("q", bytes(8 * RADIX))
+        for d in offsets:
+            counts[(d >> shift) & RADIX_MASK] += 1
+        if max(counts) == n:
+            continue
+        total = 0
+        for d in range(RADIX):
+            counts[d], total = total, total + counts[d]
+        for i in src:
+            d = (offsets[i] >> shift) & RADIX_MASK
+            dst[counts[d]] = i
+            counts[d] += 1
+        src, dst = dst, src
+    return src
+
+def radix_sort(array: List[Any], use_numpy: Optional[bool] = None,
+               key: Optional[Callable[[Any], int]] = None, reverse: bool = False) -> List[Any]:
+    n = len(array)
+    if n < 2:
+        return array
+    if key is not None:
+        return _sort_by_key(array, key, reverse, use_numpy, _radix_order)
+    if reverse:
+        radix_sort(array, use_numpy)
+        array.reverse()
+        return array
+    lo, hi = _bounds(array)
+    # Sort the offsets from the minimum so negative numbers need no special handling,
+    # and only as many bytes as the largest offset actually uses
+    passes = ((hi - lo).bit_length() + RADIX_BITS - 1) // RADIX_BITS
+
+    if _want_numpy(use_numpy):
+        keys = (np.array(array, dtype=np.int64) - lo).astype(np.uint64)
+        for p in range(passes):
+            digits = ((keys >> np.uint64(p * RADIX_BITS)) & np.uint64(RADIX_MASK)).astype(np.uint8)
+            # Stable argsort of uint8 keys is itself a counting sort in NumPy
+            keys = keys[np.argsort(digits, kind="stable")]
+        array[:] = (keys.astype(np.int64) + lo).tolist()
+        return array
+
+    src = typed_array("Q", [x - lo for x in array])
+    dst = typed_array("Q", bytes(8 * n))
+    for p in range(passes):
+        shift = p * RADIX_BITS
+        counts = typed_array("q", bytes(8 * RADIX))
+        for x in src:
+            counts[(x >> shift) & RADIX_MASK] += 1
+        if max(counts) == n:
+            # Every item has the same digit, this pass would not move anything
+            continue
+        # Turn the counts into the starting position of each digit
+        total = 0
+        for d in range(RADIX):
+            counts[d], total = total, total + counts[d]
+        for x in src:
+            d = (x >> shift) & RADIX_MASK
+            dst[counts[d]] = x
+            counts[d] += 1
+        src, dst = dst, src
+
+    array[:] = [x + lo for x in src]
+    return array
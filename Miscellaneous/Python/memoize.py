@@ -0,0 +1,296 @@
+# Bounded memoization
+# ===================
+"""
+-memoize is a caching decorator for expensive pure functions, a bigger functools.lru_cache:
+ policy:    'lru' evicts the least recently used entry, 'lfu' the least frequently used (ties: least recent)
+ ttl:       entries older than ttl seconds count as misses and are dropped
+ maxsize:   entry budget, max_bytes: byte budget measured with 'sizeof' (sys.getsizeof, so shallow by default)
+ stripes:   thread-safe mode, the cache is split into 'stripes' segments chosen by key hash,
+            each with its own lock and share of the budget, so threads rarely wait on each other
+ persist:   path of a shelve file used as a second tier, results found there survive restarts.
+            Keys are stored as '<module>.<qualname>:' + repr(arguments), so functions can share one file,
+            and arguments need a repr that is stable between runs.
+-Hit, miss, eviction and expiry counters are returned by .cache_info(). With name= they are also
+ added to the named TimerDC.timers registry as '<name>.hits', '<name>.misses', '<name>.expirations' and so on
+ (the registry shards per thread, so this adds no lock to the hit path).
+-The lock is never held while the function runs, so memoized recursive functions (like fib1) work.
+
+command line example (fib1 and a sorting workload with and without the cache):
+python memoize.py
+"""
+import atexit
+import functools
+import shelve
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from timing_tutorial import TimerDC
+
+_MISSING = object()
+_EXPIRED = object()  # Returned by _Segment.get() for an entry dropped because of ttl, treated as missing
+
+class _KwargsMark:
+    """Separates positional from keyword arguments in a key. The repr is fixed, unlike object()'s
+       which holds an address, so keys with kwargs find the same persistent entry in every process."""
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "<kwargs>"
+
+_KWARGS_MARK = _KwargsMark()
+
+def make_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    if not kwargs:
+        return args[0] if len(args) == 1 and type(args[0]) in (int, str) else args
+    return args + (_KWARGS_MARK,) + tuple(sorted(kwargs.items()))
+
+@dataclass
+class CacheStats:
+    hits:        int = 0  # Found in memory
+    disk_hits:   int = 0  # Found in the persistent tier
+    misses:      int = 0  # Function had to run
+    evictions:   int = 0  # Dropped to stay within budget
+    expirations: int = 0  # Dropped because of ttl
+    entries:     int = 0
+    bytes:       int = 0
+
+    def __add__(self, other: "CacheStats") -> "CacheStats":
+        return CacheStats(*(getattr(self, f.name) + getattr(other, f.name) for f in fields(self)))
+
+# ========
+# Segments
+# ========
+class _Segment:
+    """One independently locked part of the cache. Entries are key -> [value, size, expires, frequency]."""
+
+    def __init__(self, policy: str, maxsize: Optional[int], max_bytes: Optional[int],
+                 ttl: Optional[float], sizeof: Callable[[Any], int], locked: bool) -> None:
+        self.policy = policy
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.lock = threading.Lock() if locked else None
+        self.stats = CacheStats()
+        self.entries: "OrderedDict[Hashable, list]" = OrderedDict()  # In recency order, oldest first
+        # LFU only: frequency -> keys with that frequency in recency order
+        self.buckets: Dict[int, "OrderedDict[Hashable, None]"] = defaultdict(OrderedDict)
+
+    def get(self, key: Hashable) -> Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            return _MISSING
+        if entry[2] is not None and entry[2] < time.monotonic():
+            self._drop(key)
+            self.stats.expirations += 1
+            return _EXPIRED
+        if self.policy == "lfu":
+            self._touch(key, entry)
+        else:
+            self.entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any, disk_hit: bool = False) -> int:
+        """Store value found in the persistent tier (disk_hit) or just computed (a miss), returns how many entries had to be evicted"""
+        if disk_hit:
+            self.stats.disk_hits += 1
+        else:
+            self.stats.misses += 1
+        if key in self.entries:
+            self._drop(key)
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Would never fit, caching it would only flush everything else
+            return 0
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        self.entries[key] = [value, size, expires, 1]
+        self.stats.entries += 1
+        self.stats.bytes += size
+        if self.policy == "lfu":
+            self.buckets[1][key] = None
+
+        evicted = 0
+        while ((self.maxsize is not None and self.stats.entries > self.maxsize)
+               or (self.max_bytes is not None and self.stats.bytes > self.max_bytes)):
+            self._drop(self._victim(exclude=key))
+            evicted += 1
+        self.stats.evictions += evicted
+        return evicted
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.buckets.clear()
+        self.stats.entries = self.stats.bytes = 0
+
+    def _victim(self, exclude: Hashable) -> Hashable:
+        if self.policy == "lfu":
+            for freq in sorted(self.buckets):
+                for key in self.buckets[freq]:
+                    if key != exclude:
+                        return key
+        for key in self.entries:
+            if key != exclude:
+                return key
+        return exclude
+
+    def _touch(self, key: Hashable, entry: list) -> None:
+        # Move key from its frequency bucket to the next one
+        freq = entry[3]
+        bucket = self.buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[freq]
+        entry[3] = freq + 1
+        self.buckets[freq + 1][key] = None
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self.entries.pop(key)
+        self.stats.entries -= 1
+        self.stats.bytes -= entry[1]
+        if self.policy == "lfu":
+            bucket = self.buckets[entry[3]]
+            del bucket[key]
+            if not bucket:
+                del self.buckets[entry[3]]
+
+# =========
+# Decorator
+# =========
+def memoize(maxsize: Optional[int] = 128, policy: str = "lru", ttl: Optional[float] = None,
+            max_bytes: Optional[int] = None, sizeof: Callable[[Any], int] = sys.getsizeof,
+            stripes: int = 0, persist: Optional[str] = None, name: Optional[str] = None) -> Callable:
+    """Caching decorator, see the module docstring. maxsize=None and max_bytes=None means unbounded.
+       stripes=0 is the fastest mode but not thread-safe, stripes>=1 locks each of that many segments."""
+    if policy not in ("lru", "lfu"):
+        raise ValueError(f"Unknown policy {policy!r}, use 'lru' or 'lfu'")
+
+    def decorator(func: Callable) -> Callable:
+        count = max(stripes, 1)
+        segments = [_Segment(policy,
+                             None if maxsize is None else max(maxsize // count, 1),
+                             None if max_bytes is None else max(max_bytes // count, 1),
+                             ttl, sizeof, locked=stripes > 0)
+                     for _ in range(count)]
+        shelf = shelve.open(persist) if persist else None
+        shelf_lock = threading.Lock()
+        if shelf is not None:
+            atexit.register(shelf.close)
+        if name:
+            for counter in ("hits", "disk_hits", "misses", "evictions", "expirations"):
+                TimerDC.timers.setdefault(f"{name}.{counter}", 0)
+
+        def record(counter: str, amount: int = 1) -> None:
+            if name:
+                TimerDC.timers.add(f"{name}.{counter}", amount)
+
+        # Shelf keys carry the function, so memoized functions sharing one persist file don't see each other's results
+        prefix = f"{func.__module__}.{func.__qualname__}:"
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = make_key(args, kwargs)
+            segment = segments[hash(key) % count] if count > 1 else segments[0]
+            lock = segment.lock
+
+            if lock:
+                with lock:
+                    value = segment.get(key)
+            else:
+                value = segment.get(key)
+            if value is not _MISSING:
+                if value is not _EXPIRED:
+                    record("hits")
+                    return value
+                record("expirations")
+                value = _MISSING
+
+            disk_hit = False
+            if shelf is not None:
+                with shelf_lock:
+                    value = shelf.get(prefix + repr(key), _MISSING)
+                if value is not _MISSING:
+                    disk_hit = True
+                    record("disk_hits")
+
+            if value is _MISSING:
+                # Run the function without holding any lock, it may recurse into this cache
+                value = func(*args, **kwargs)
+                record("misses")
+                if shelf is not None:
+                    with shelf_lock:
+                        shelf[prefix + repr(key)] = value
+
+            # The disk hit or miss is counted by put(), under the segment lock like hits are in get()
+            if lock:
+                with lock:
+                    evicted = segment.put(key, value, disk_hit)
+            else:
+                evicted = segment.put(key, value, disk_hit)
+            if evicted:
+                record("evictions", evicted)
+            return value
+
+        def cache_info() -> CacheStats:
+            return sum((segment.stats for segment in segments), CacheStats())
+
+        def cache_clear(persistent: bool = False) -> None:
+            for segment in segments:
+                if segment.lock:
+                    with segment.lock:
+                        segment.clear()
+                else:
+                    segment.clear()
+            if persistent and shelf is not None:
+                with shelf_lock:
+                    shelf.clear()
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+# =====
+# Demo
+# =====
+def main() -> int:
+    import random
+
+    from Timer import Timer_class
+    import scratch_fibo
+    import sorting
+
+    # fib1 is exponential without a cache and linear with one. Rebinding the module global
+    # makes its recursive calls go through the cache too.
+    with Timer_class.Timer(text="fib1(27) uncached: {:0.6f} seconds"):
+        scratch_fibo.fib1(27)
+    original = scratch_fibo.fib1
+    scratch_fibo.fib1 = memoize(maxsize=None, name="fib1")(original)
+    with Timer_class.Timer(text="fib1(27) memoized: {:0.6f} seconds"):
+        scratch_fibo.fib1(27)
+    print(scratch_fibo.fib1.cache_info())
+    scratch_fibo.fib1 = original
+
+    # Sorting the same few inputs over and over, with a byte budget that holds only some of the results
+    rng = random.Random(0)
+    inputs = [tuple(rng.randint(0, 1000) for _ in range(2000)) for _ in range(20)]
+    workload = [rng.choice(inputs) for _ in range(200)]
+    cached_sort = memoize(maxsize=None, policy="lfu", max_bytes=8 * 16_000 * 10,
+                          sizeof=lambda result: sys.getsizeof(result) + 28 * len(result), name="sort")(
+                              lambda data: tuple(sorting.introsort(list(data))))
+    with Timer_class.Timer(text="200 sorts uncached: {:0.6f} seconds"):
+        for data in workload:
+            sorting.introsort(list(data))
+    with Timer_class.Timer(text="200 sorts memoized: {:0.6f} seconds"):
+        for data in workload:
+            cached_sort(data)
+    print(cached_sort.cache_info())
+    print({key: value for key, value in TimerDC.timers.items() if key.startswith(("fib1.", "sort."))})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
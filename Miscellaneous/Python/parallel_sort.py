@@ -0,0 +1,134 @@
+# Multi-core sorting
+# ==================
+"""
+-parallel_sort splits the input into one chunk per worker, sorts the chunks in a ProcessPoolExecutor
+ and k-way merges the sorted chunks back together with a heap.
+-Int and float lists are copied once into a multiprocessing.shared_memory block as a typed array,
+ workers attach to the block by name and sort their slice in place, so the data itself is never pickled.
+ Any other item type falls back to sending the chunks to the workers through pickle.
+-Worker processes take a while to start, small inputs are sorted in the calling process.
+
+command line example (scaling benchmark over 1, 2, 4 and 8 workers):
+python parallel_sort.py --size 1e6
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+from array import array as typed_array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, List, Optional, Sequence
+
+from sorting import keyed
+
+PARALLEL_THRESHOLD = 50_000  # Inputs shorter than this are not worth starting workers for
+
+def typecode_for(data: Sequence[Any]) -> Optional[str]:
+    """array typecode that holds every item of data exactly, None if there is none"""
+    kinds = set(map(type, data))
+    if kinds == {int}:
+        try:
+            typed_array("q", data)
+        except OverflowError:
+            return None
+        return "q"
+    if kinds == {float}:
+        return "d"
+    return None
+
+def chunk_bounds(n: int, chunks: int) -> List[int]:
+    """Boundaries [0, ..., n] that split n items into 'chunks' nearly equal slices"""
+    return [n * c // chunks for c in range(chunks + 1)]
+
+# ========
+# Workers
+# ========
+def _sort_shared_chunk(name: str, typecode: str, lo: int, hi: int) -> None:
+    # Runs in a worker: attach to the shared block and sort view[lo:hi] in place
+    shm = shared_memory.SharedMemory(name=name)
+    view = shm.buf.cast(typecode)
+    try:
+        chunk = view[lo:hi].tolist()
+        chunk.sort()
+        view[lo:hi] = typed_array(typecode, chunk)
+    finally:
+        # Every view has to be released before the block can be closed
+        view.release()
+        shm.close()
+
+def _sort_pickled_chunk(chunk: List[Any]) -> List[Any]:
+    chunk.sort()
+    return chunk
+
+# ===========
+# Entry point
+# ===========
+def kway_merge(chunks: Sequence[Sequence[Any]]) -> List[Any]:
+    """Heap based merge of sorted chunks. Like sorting.merge, ties go to the earlier chunk, so the merge is stable."""
+    return list(heapq.merge(*chunks))
+
+@keyed
+def parallel_sort(array: Sequence[Any], workers: Optional[int] = None) -> List[Any]:
+    """Sort array on 'workers' processes (default os.cpu_count()), returns a new sorted list.
+       With key= or reverse= the decorated items are not ints or floats, so they go through pickle."""
+    n = len(array)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or n < PARALLEL_THRESHOLD:
+        return sorted(array)
+
+    bounds = chunk_bounds(n, workers)
+    typecode = typecode_for(array)
+
+    if typecode is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_sort_pickled_chunk, [list(array[bounds[c]:bounds[c + 1]]) for c in range(workers)]))
+        return kway_merge(chunks)
+
+    data = typed_array(typecode, array)
+    shm = shared_memory.SharedMemory(create=True, size=max(data.itemsize * n, 1))
+    view = shm.buf.cast(typecode)
+    try:
+        view[:n] = data
+        del data
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_sort_shared_chunk, shm.name, typecode, bounds[c], bounds[c + 1])
+                       for c in range(workers)]
+            for future in futures:
+                future.result()
+        chunks = [view[bounds[c]:bounds[c + 1]] for c in range(workers)]
+        result = kway_merge(chunks)
+        for chunk in chunks:
+            chunk.release()
+        return result
+    finally:
+        view.release()
+        shm.close()
+        shm.unlink()
+
+# =========
+# Benchmark
+# =========
+def main(argv: Sequence[str] = None) -> int:
+    import sort_bench
+
+    parser = argparse.ArgumentParser(description="Scaling benchmark for parallel_sort")
+    parser.add_argument("--size", type=lambda s: int(float(s)), default=10**6)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    base = sort_bench.random_shape(args.size, random.Random(args.seed))
+    print(f"{os.cpu_count()} CPUs, {args.size} random ints")
+    single = None
+    for workers in args.workers:
+        samples = sort_bench.time_trials(lambda data: parallel_sort(data, workers), base, args.repeat)
+        best = min(samples) / 1e9
+        single = single or best
+        print(f"workers: {workers:>2}  min: {best:0.6f} s  speedup: {single / best:0.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# Selection and partial sorting
+# =============================
+"""
+-For when only the smallest/largest k items or a median are needed, not a fully sorted list.
+-nsmallest/nlargest: consume any iterable (including generators) once, keep a heap of at most k items,
+ O(n log k) time and O(k) memory. They return the same list sorted(...)[:k] would, ties in input order.
+-nth_element: in-place quickselect on the same pivot choice and three-way partition as introsort,
+ falling back to heapsort on the remaining slice if partitioning goes badly (introselect), O(n) on average.
+-partial_sort: the k smallest items, sorted, at the front of the list, the rest in no particular order.
+
+command line example (benchmark against a full sort plus slicing):
+python selection.py --size 1e6 --k 10 100 1000 10000
+"""
+import argparse
+import heapq
+import random
+import sys
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+import sorting
+
+# ====================
+# Streaming top-k
+# ====================
+def nsmallest(iterable: Iterable[Any], k: int, key: Optional[Callable[[Any], Any]] = None) -> List[Any]:
+    """The k smallest items of iterable in ascending order, with bounded memory"""
+    if k <= 0:
+        return []
+    # heapq keeps a k-sized heap while streaming and tags entries with their position,
+    # so equal keys come out in input order exactly like a stable sort
+    return heapq.nsmallest(k, iterable, key=key)
+
+def nlargest(iterable: Iterable[Any], k: int, key: Optional[Callable[[Any], Any]] = None) -> List[Any]:
+    """The k largest items of iterable in descending order, with bounded memory"""
+    if k <= 0:
+        return []
+    return heapq.nlargest(k, iterable, key=key)
+
+# ===========
+# Quickselect
+# ===========
+def nth_element(array: List[Any], k: int, lo: int = 0, hi: Optional[int] = None) -> List[Any]:
+    """Reorder array[lo:hi] in place so array[k] holds the item a full sort would put there,
+       with nothing larger before it and nothing smaller after it. Returns array."""
+    if hi is None:
+        hi = len(array)
+    if not lo <= k < hi:
+        raise IndexError(f"k={k} is outside of [{lo}, {hi})")
+    depth_limit = 2 * max(hi - lo, 1).bit_length()
+
+    while hi - lo > sorting.INSERTION_CUTOFF:
+        if depth_limit == 0:
+            sorting.heapsort(array, lo, hi)
+            return array
+        depth_limit -= 1
+
+        lt, gt = sorting.partition3(array, lo, hi, sorting.choose_pivot(array, lo, hi))
+        # Only the side holding k needs more work, a k among the pivot copies is already in place
+        if k < lt:
+            hi = lt
+        elif k >= gt:
+            lo = gt
+        else:
+            return array
+
+    sorting.insertion_sort(array, lo, hi)
+    return array
+
+def quickselect(array: List[Any], k: int) -> Any:
+    """The k-th smallest item (0 based) of array, reordering array in place"""
+    return nth_element(array, k)[k]
+
+def median(array: Sequence[Any]) -> Any:
+    """Median of array without sorting it, the mean of the two middle items for even lengths"""
+    if not array:
+        raise ValueError("median of an empty sequence")
+    data = list(array)
+    n = len(data)
+    upper = quickselect(data, n // 2)
+    if n % 2:
+        return upper
+    # After selecting n // 2, the lower middle is the largest item in front of it
+    return (max(data[:n // 2]) + upper) / 2
+
+def partial_sort(array: List[Any], k: int) -> List[Any]:
+    """Put the k smallest items of array, sorted, in array[:k], the rest follow in no particular order"""
+    n = len(array)
+    k = min(k, n)
+    if k <= 0:
+        return array
+    if k < n:
+        nth_element(array, k - 1)
+    sorting.introsort(array, 0, k)
+    return array
+
+# =========
+# Benchmark
+# =========
+def main(argv: Sequence[str] = None) -> int:
+    import sort_bench
+
+    parser = argparse.ArgumentParser(description="Compare top-k selection with a full sort plus slicing")
+    parser.add_argument("--size", type=lambda s: int(float(s)), default=10**6)
+    parser.add_argument("--k", nargs="+", type=lambda s: int(float(s)), default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    base = sort_bench.random_shape(args.size, random.Random(0))
+    for k in args.k:
+        candidates = {
+            "sorted()[:k]":     lambda data: sorted(data)[:k],
+            "introsort[:k]":    lambda data: sorting.introsort(data)[:k],
+            "nsmallest (gen)":  lambda data: nsmallest((x for x in data), k),
+            "nth_element":      lambda data: nth_element(data, k - 1),
+            "partial_sort":     lambda data: partial_sort(data, k),
+        }
+        for name, func in candidates.items():
+            best = min(sort_bench.time_trials(func, base, args.repeat)) / 1e9
+            print(f"n: {args.size}  k: {k:>6}  {name:>16}  min: {best:0.6f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+# Benchmark suite for sorting.py
+# ==============================
+"""
+-Times each sorting algorithm over a grid of input sizes and input shapes.
+-Every trial gets a freshly built copy of the input, the copy is made outside of the timed region,
+ so nothing but the sort itself is measured (unlike pasting the array into a timeit stmt string).
+-With --counts the sorting.py algorithms are also run once in their instrumented form (sort_counts.py),
+ adding comparisons, moves, swaps, temporary lists and recursion depth to each row. The timed runs
+ always use the plain functions.
+-Results are written as JSON or CSV (picked from the file extension) so scaling curves can be charted.
+
+command line example:
+python sort_bench.py --sizes 100 1000 10000 --shapes random sorted --repeat 5 --out results.json
+python sort_bench.py --algorithms quicksort introsort --sizes 1e6 --shapes random --memory
+python sort_bench.py --algorithms insertion_sort merge_sort quicksort --sizes 100 1000 --counts
+"""
+import argparse
+import csv
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import sorting
+from adaptive_sort import sort as adaptive_sort
+from integer_sort import counting_sort, radix_sort
+from parallel_sort import parallel_sort
+
+# ===========
+# Input grid
+# ===========
+SIZES: List[int] = [10**k for k in range(2, 8)]  # 1e2 .. 1e7
+
+def random_shape(n: int, rng: random.Random) -> List[int]:
+    return [rng.randint(0, n) for _ in range(n)]
+
+def sorted_shape(n: int, rng: random.Random) -> List[int]:
+    return list(range(n))
+
+def reversed_shape(n: int, rng: random.Random) -> List[int]:
+    return list(range(n, 0, -1))
+
+def few_unique_shape(n: int, rng: random.Random) -> List[int]:
+    return [rng.randint(0, 9) for _ in range(n)]
+
+def nearly_sorted_shape(n: int, rng: random.Random) -> List[int]:
+    # Sorted input with roughly 1% of the positions swapped at random
+    array = list(range(n))
+    for _ in range(max(1, n // 100)):
+        i, j = rng.randrange(n), rng.randrange(n)
+        array[i], array[j] = array[j], array[i]
+    return array
+
+SHAPES: Dict[str, Callable[[int, random.Random], List[Any]]] = {
+    "random":        random_shape,
+    "sorted":        sorted_shape,
+    "reversed":      reversed_shape,
+    "few_unique":    few_unique_shape,
+    "nearly_sorted": nearly_sorted_shape,
+}
+
+# ==========
+# Algorithms
+# ==========
+ALGORITHMS: Dict[str, Callable[[List[Any]], Any]] = {}
+SIZE_LIMITS: Dict[str, Optional[int]] = {}  # Largest size an algorithm is run at, None means no limit
+
+def register(name: str, func: Callable[[List[Any]], Any], limit: Optional[int] = None) -> None:
+    """Add a sorting function to the suite. 'limit' caps the input size it is benchmarked at."""
+    ALGORITHMS[name] = func
+    SIZE_LIMITS[name] = limit
+
+# Quadratic sorts are capped, 1e5 elements already takes minutes
+register("bubble_sort",    sorting.bubble_sort,    limit=10**4)
+register("insertion_sort", sorting.insertion_sort, limit=10**4)
+register("merge_sort",     sorting.merge_sort)
+register("bottom_up_merge_sort", sorting.bottom_up_merge_sort)
+register("quicksort",      sorting.quicksort)
+register("introsort",      sorting.introsort)
+register("parallel_sort",  parallel_sort)
+register("counting_sort",  counting_sort)
+register("radix_sort",     radix_sort)
+register("adaptive_sort",  adaptive_sort)
+register("sorted",         sorted)
+
+# =======
+# Timing
+# =======
+def time_trials(func: Callable[[List[Any]], Any], base: Sequence[Any], repeat: int = 3) -> List[int]:
+    """Run func on 'repeat' fresh copies of base, returns the elapsed time of each trial in nanoseconds"""
+    samples = []
+    for _ in range(repeat):
+        data = list(base)
+        tic = time.perf_counter_ns()
+        func(data)
+        toc = time.perf_counter_ns()
+        samples.append(toc - tic)
+    return samples
+
+def peak_memory(func: Callable[[List[Any]], Any], base: Sequence[Any]) -> int:
+    """Peak bytes allocated by one run of func on a copy of base, the copy itself is not counted.
+       Run separately from time_trials since tracemalloc slows allocation down considerably."""
+    data = list(base)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        func(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+def run_suite(algorithms: Sequence[str] = None, sizes: Sequence[int] = SIZES,
+              shapes: Sequence[str] = None, repeat: int = 3, seed: int = 0, memory: bool = False,
+              counts: bool = False, logger: Optional[Callable[[str], None]] = print) -> List[Dict[str, Any]]:
+    """Benchmark every algorithm on every (shape, size) pair, returns one result row per combination"""
+    algorithms = list(algorithms or ALGORITHMS)
+    if counts:
+        import sort_counts  # Generates the instrumented variants, only wanted when counting
+    shapes = list(shapes or SHAPES)
+    results = []
+    for shape in shapes:
+        for size in sizes:
+            # Same input for every algorithm so the rows are comparable
+            base = SHAPES[shape](size, random.Random(seed))
+            for name in algorithms:
+                limit = SIZE_LIMITS.get(name)
+                if limit is not None and size > limit:
+                    continue
+                samples = time_trials(ALGORITHMS[name], base, repeat)
+                row = {
+                    "algorithm":  name,
+                    "shape":      shape,
+                    "size":       size,
+                    "repeat":     repeat,
+                    "min_s":      min(samples) / 1e9,
+                    "median_s":   statistics.median(samples) / 1e9,
+                    "samples_ns": samples,
+                }
+                line = f"{name:>20} {shape:>14} {size:>10}  min: {row['min_s']:0.6f} s  median: {row['median_s']:0.6f} s"
+                if memory:
+                    row["peak_bytes"] = peak_memory(ALGORITHMS[name], base)
+                    line += f"  peak: {row['peak_bytes'] / 2**20:0.2f} MiB"
+                if counts and name in sort_counts.VARIANTS:
+                    row.update(asdict(sort_counts.count_operations(name, base)))
+                    line += f"  comparisons: {row['comparisons']}  moves: {row['moves']}  depth: {row['max_depth']}"
+                results.append(row)
+                if logger:
+                    logger(line)
+    return results
+
+# ======
+# Output
+# ======
+def environment() -> Dict[str, str]:
+    """Describe the interpreter and host the results came from"""
+    return {
+        "python":         platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine":        platform.machine(),
+        "platform":       platform.platform(),
+    }
+
+def write_results(results: List[Dict[str, Any]], path: str) -> None:
+    """Write results to path as CSV if it ends in .csv, otherwise as JSON"""
+    if path.endswith(".csv"):
+        fields = ["algorithm", "shape", "size", "repeat", "min_s", "median_s", "peak_bytes", "comparisons", "moves", "swaps",
+                  "allocations", "max_depth", "samples_ns"]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            for row in results:
+                writer.writerow(dict(row, samples_ns=" ".join(map(str, row["samples_ns"]))))
+    else:
+        with open(path, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the algorithms in sorting.py")
+    parser.add_argument("--algorithms", nargs="+", choices=list(ALGORITHMS), default=None)
+    parser.add_argument("--sizes", nargs="+", type=lambda s: int(float(s)), default=SIZES)
+    parser.add_argument("--shapes", nargs="+", choices=list(SHAPES), default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory", action="store_true", help="Also record tracemalloc peak bytes per algorithm")
+    parser.add_argument("--counts", action="store_true", help="Also count operations of the sorting.py algorithms")
+    parser.add_argument("--out", default=None, help="Output file, .csv for CSV, anything else for JSON")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.algorithms, args.sizes, args.shapes, args.repeat, args.seed, args.memory, args.counts)
+    if args.out:
+        write_results(results, args.out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+# Operation counts for sorting.py
+# ===============================
+"""
+-Counts what the sorting algorithms do instead of how long it takes, which doesn't depend on the host:
+ comparisons:  comparisons between items (index and length checks are not counted)
+ moves:        items written into a list slot: a[i] = x, append/insert, and for bulk copies
+               (slices, extend, +=, list +, slice assignment) the number of items copied
+ swaps:        statements of the form a[i], a[j] = a[j], a[i]
+ allocations:  temporary lists created: [...], list comprehensions, slices, list +, list()/sorted()
+ max_depth:    deepest nesting of calls to the instrumented functions (recursion depth)
+-sorting.py itself is never changed, so there is no cost when counting is off. The instrumented variants
+ are generated from its source with ast when this module is imported: every function gets depth tracking
+ and the list operations above are routed through counting hooks. Comparisons are counted by wrapping the
+ input items in Counted, whose comparison methods count, so the exact number of item comparisons is
+ found wherever they happen (including inside bisect).
+-Because the counts are exact, they can be checked against the O(n^2) and O(n log n) predictions:
+ the 'ratio' column divides comparisons by n^2/2 or n*log2(n), and it should stay about flat as n grows.
+
+command line example:
+python sort_counts.py --sizes 100 1000 10000 --algorithms insertion_sort merge_sort quicksort introsort
+"""
+import argparse
+import ast
+import inspect
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence
+
+import sorting
+
+# Functions of sorting.py that get an instrumented variant, the helpers too so calls between them are counted
+INSTRUMENTED = ["bubble_sort", "insertion_sort", "merge", "merge_sort", "_extend_run", "find_runs", "merge_runs",
+                "bottom_up_merge_sort", "quicksort", "median_of_three", "choose_pivot", "partition3",
+                "heapsort", "introsort"]
+QUADRATIC = {"bubble_sort", "insertion_sort"}
+
+@dataclass
+class OpCounts:
+    comparisons: int = 0
+    moves:       int = 0
+    swaps:       int = 0
+    allocations: int = 0
+    max_depth:   int = 0
+
+# =====
+# Hooks
+# =====
+class _Hooks:
+    """What the generated code calls, everything is counted into .counts"""
+    def __init__(self) -> None:
+        self.counts = OpCounts()
+        self.depth = 0
+
+    def enter(self) -> None:
+        self.depth += 1
+        if self.depth > self.counts.max_depth:
+            self.counts.max_depth = self.depth
+
+    def exit(self) -> None:
+        self.depth -= 1
+
+    def move(self, count: int) -> None:
+        self.counts.moves += count
+
+    def swap(self) -> None:
+        self.counts.swaps += 1
+
+    def moved(self, result: Any) -> Any:
+        self.counts.moves += 1
+        return result
+
+    def stored(self, value: Any) -> Any:
+        self.counts.moves += len(value)
+        return value
+
+    def bulk(self, value: Any) -> Any:
+        value = value if hasattr(value, "__len__") else list(value)
+        self.counts.moves += len(value)
+        return value
+
+    def new(self, value: Any) -> Any:
+        if type(value) is list:
+            self.counts.allocations += 1
+            self.counts.moves += len(value)
+        return value
+
+    def add(self, left: Any, right: Any) -> Any:
+        return self.new(left + right)
+
+    def iadd(self, target: Any, value: Any) -> Any:
+        if type(target) is list:
+            self.counts.moves += len(value)
+        target += value
+        return target
+
+_ops = _Hooks()
+
+class Counted:
+    """An item whose comparisons are counted"""
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __lt__(self, other: "Counted") -> bool:
+        _ops.counts.comparisons += 1
+        return self.value < other.value
+
+    def __le__(self, other: "Counted") -> bool:
+        _ops.counts.comparisons += 1
+        return self.value <= other.value
+
+    def __gt__(self, other: "Counted") -> bool:
+        _ops.counts.comparisons += 1
+        return self.value > other.value
+
+    def __ge__(self, other: "Counted") -> bool:
+        _ops.counts.comparisons += 1
+        return self.value >= other.value
+
+    def __eq__(self, other: object) -> bool:
+        _ops.counts.comparisons += 1
+        return self.value == getattr(other, "value", other)
+
+    def __ne__(self, other: object) -> bool:
+        _ops.counts.comparisons += 1
+        return self.value != getattr(other, "value", other)
+
+    def __hash__(self) -> int:
+        return hash(self.value)
+
+# ==============
+# Code generation
+# ==============
+def _hook(name: str, *args: ast.expr) -> ast.Call:
+    return ast.Call(func=ast.Attribute(value=ast.Name(id="_ops", ctx=ast.Load()), attr=name, ctx=ast.Load()),
+                    args=list(args), keywords=[])
+
+def _is_slice(node: ast.expr) -> bool:
+    return isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice)
+
+class _Instrument(ast.NodeTransformer):
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        self.generic_visit(node)
+        node.decorator_list = []  # @keyed only adds key=/reverse=, the engine is what gets counted
+        node.body = [ast.Expr(_hook("enter")),
+                     ast.Try(body=node.body, handlers=[], orelse=[], finalbody=[ast.Expr(_hook("exit"))])]
+        return node
+
+    def visit_Subscript(self, node: ast.Subscript) -> ast.expr:
+        self.generic_visit(node)
+        if isinstance(node.ctx, ast.Load) and isinstance(node.slice, ast.Slice):
+            return _hook("new", node)
+        return node
+
+    def visit_List(self, node: ast.List) -> ast.expr:
+        self.generic_visit(node)
+        return _hook("new", node) if isinstance(node.ctx, ast.Load) else node
+
+    def visit_ListComp(self, node: ast.ListComp) -> ast.expr:
+        self.generic_visit(node)
+        return _hook("new", node)
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.expr:
+        self.generic_visit(node)
+        return _hook("add", node.left, node.right) if isinstance(node.op, ast.Add) else node
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> ast.stmt:
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Add) and isinstance(node.target, ast.Name):
+            return ast.Assign(targets=[ast.Name(id=node.target.id, ctx=ast.Store())],
+                              value=_hook("iadd", ast.Name(id=node.target.id, ctx=ast.Load()), node.value))
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.expr:
+        self.generic_visit(node)
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr in ("append", "insert"):
+            return _hook("moved", node)
+        if isinstance(func, ast.Attribute) and func.attr == "extend" and node.args:
+            node.args[0] = _hook("bulk", node.args[0])
+        elif isinstance(func, ast.Name) and func.id in ("list", "sorted"):
+            return _hook("new", node)
+        return node
+
+    def visit_Assign(self, node: ast.Assign) -> List[ast.stmt]:
+        self.generic_visit(node)
+        statements: List[ast.stmt] = [node]
+        for target in node.targets:
+            elements = target.elts if isinstance(target, ast.Tuple) else [target]
+            values = node.value.elts if isinstance(node.value, ast.Tuple) and len(node.value.elts) == len(elements) else None
+            single = sum(isinstance(e, ast.Subscript) and not _is_slice(e) for e in elements)
+            if single:
+                statements.append(ast.Expr(_hook("move", ast.Constant(single))))
+            if single == 2 and len(elements) == 2:
+                statements.append(ast.Expr(_hook("swap")))
+            # Slice assignment writes as many items as the value holds
+            for index, element in enumerate(elements):
+                if _is_slice(element):
+                    if values is not None:
+                        values[index] = _hook("stored", values[index])
+                    elif len(elements) == 1:
+                        node.value = _hook("stored", node.value)
+        return statements
+
+def _generate() -> Dict[str, Callable]:
+    # Public names of keyed engines (merge_sort = keyed(_merge_sort)) map to the def of the engine
+    engines = {name: inspect.unwrap(getattr(sorting, name)).__name__ for name in INSTRUMENTED}
+    source = inspect.getsource(sorting)
+    tree = ast.parse(source)
+    tree.body = [node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name in engines.values()]
+    tree = ast.fix_missing_locations(_Instrument().visit(tree))
+    # Module constants and imports come from sorting itself, the generated functions replace the originals
+    namespace = dict(vars(sorting))
+    namespace["_ops"] = _ops
+    exec(compile(tree, f"<instrumented {sorting.__file__}>", "exec"), namespace)
+    return {name: namespace[engine] for name, engine in engines.items()}
+
+VARIANTS = _generate()
+
+def count_operations(algorithm: str, array: Sequence[Any]) -> OpCounts:
+    """Run the instrumented variant of algorithm on a copy of array and return what it did"""
+    _ops.counts = OpCounts()
+    _ops.depth = 0
+    data = [Counted(item) for item in array]
+    result = VARIANTS[algorithm](data)
+    if result is None:
+        result = data
+    if [item.value for item in result] != sorted(array):
+        raise AssertionError(f"Instrumented {algorithm} did not sort its input")
+    return _ops.counts
+
+def prediction(algorithm: str, n: int) -> float:
+    """Comparisons expected up to a constant: n^2/2 for the quadratic sorts, n*log2(n) otherwise"""
+    if n < 2:
+        return 1.0
+    return n * n / 2 if algorithm in QUADRATIC else n * math.log2(n)
+
+# =========
+# Benchmark
+# =========
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Operation counts of the sorting.py algorithms next to their timings")
+    parser.add_argument("--algorithms", nargs="+", default=["bubble_sort", "insertion_sort", "merge_sort", "quicksort",
+                                                            "bottom_up_merge_sort", "heapsort", "introsort"],
+                        choices=[name for name in INSTRUMENTED if name.endswith("sort")])
+    parser.add_argument("--sizes", nargs="+", type=lambda s: int(float(s)), default=[100, 1000, 5000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'algorithm':>20} {'n':>7} {'time s':>9} {'comparisons':>12} {'ratio':>6} {'moves':>10} "
+          f"{'swaps':>9} {'allocs':>7} {'depth':>6}")
+    for algorithm in args.algorithms:
+        for n in args.sizes:
+            rng = random.Random(args.seed)
+            data = [rng.randint(0, n) for _ in range(n)]
+            copy = list(data)
+            tic = time.perf_counter()
+            getattr(sorting, algorithm)(copy)
+            elapsed = time.perf_counter() - tic
+            counts = count_operations(algorithm, data)
+            print(f"{algorithm:>20} {n:>7} {elapsed:>9.4f} {counts.comparisons:>12} "
+                  f"{counts.comparisons / prediction(algorithm, n):>6.2f} {counts.moves:>10} {counts.swaps:>9} "
+                  f"{counts.allocations:>7} {counts.max_depth:>6}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
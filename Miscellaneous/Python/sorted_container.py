@@ -0,0 +1,304 @@
+# Incrementally maintained sorted container
+# =========================================
+"""
+-SortedList keeps its items sorted while they are inserted, instead of re-sorting after every batch.
+-Items live in a list of sorted chunks of about 'load' items each, plus the largest item of every chunk.
+ bisect on the chunk maxima finds the chunk, bisect inside the chunk finds the position,
+ so inserts only shift items within one short chunk (like insertion_sort's inner loop, but bounded).
+-A Fenwick tree over the chunk lengths turns a position into (chunk, offset) and back in O(log n).
+ It is updated in place on insert/remove and rebuilt lazily when chunks are split or joined.
+-update() sorts the incoming batch with bottom_up_merge_sort and, for large batches, merges it
+ with the existing items in one pass using sorting.merge.
+
+command line example (mixed insert/query throughput at 1e6 items):
+python sorted_container.py --size 1e6 --ops 1e5
+"""
+import argparse
+import random
+import sys
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Iterable, Iterator, List, Sequence, Tuple
+
+import sorting
+
+class SortedList:
+    def __init__(self, iterable: Iterable[Any] = (), load: int = 1000) -> None:
+        self._load = load
+        self._len = 0
+        self._lists: List[List[Any]] = []  # Sorted chunks, all of them together are in order
+        self._maxes: List[Any] = []        # Last (largest) item of each chunk
+        self._tree: List[int] = []         # Fenwick tree of chunk lengths, empty when it needs a rebuild
+        self.update(iterable)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        for chunk in self._lists:
+            yield from chunk
+
+    def __repr__(self) -> str:
+        return f"SortedList({list(self)!r})"
+
+    def __contains__(self, value: Any) -> bool:
+        k = bisect_left(self._maxes, value)
+        if k == len(self._maxes):
+            return False
+        chunk = self._lists[k]
+        i = bisect_left(chunk, value)
+        return chunk[i] == value
+
+    # ============
+    # Fenwick tree
+    # ============
+    def _build_tree(self) -> None:
+        tree = [len(chunk) for chunk in self._lists]
+        for i in range(len(tree)):
+            j = i | (i + 1)
+            if j < len(tree):
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, k: int, delta: int) -> None:
+        # Chunk k changed length by delta, only worth doing while the tree is valid
+        tree = self._tree
+        if tree:
+            while k < len(tree):
+                tree[k] += delta
+                k |= k + 1
+
+    def _position(self, k: int, i: int) -> int:
+        # Global index of item i in chunk k: lengths of chunks 0..k-1 plus i
+        if not self._tree:
+            self._build_tree()
+        tree = self._tree
+        while k > 0:
+            i += tree[k - 1]
+            k &= k - 1
+        return i
+
+    def _locate(self, index: int) -> Tuple[int, int]:
+        # (chunk, offset) of the item at global index, which must be in range
+        if not self._tree:
+            self._build_tree()
+        tree = self._tree
+        k = 0
+        bit = 1 << (len(tree).bit_length() - 1)
+        while bit:
+            nxt = k + bit
+            if nxt <= len(tree) and tree[nxt - 1] <= index:
+                index -= tree[nxt - 1]
+                k = nxt
+            bit >>= 1
+        return k, index
+
+    # ==========
+    # Insertion
+    # ==========
+    def add(self, value: Any) -> None:
+        """Insert value, after any items equal to it"""
+        if not self._lists:
+            self._lists.append([value])
+            self._maxes.append(value)
+            self._tree = []
+            self._len = 1
+            return
+
+        k = bisect_right(self._maxes, value)
+        if k == len(self._maxes):
+            # Larger than everything, goes at the end of the last chunk
+            k -= 1
+            self._lists[k].append(value)
+            self._maxes[k] = value
+        else:
+            insort(self._lists[k], value)
+        self._len += 1
+        self._tree_add(k, 1)
+        if len(self._lists[k]) > 2 * self._load:
+            self._split(k)
+
+    def update(self, iterable: Iterable[Any]) -> None:
+        """Insert every item of iterable. The batch is sorted once, and merged with the
+           existing items in one pass when it is large compared to the container."""
+        values = sorting.bottom_up_merge_sort(list(iterable))
+        if not values:
+            return
+        if len(values) * 4 >= self._len:
+            # sorting.merge prefers its left side on ties, so existing items stay in front of equal new ones
+            self._rebuild(sorting.merge(list(self), values))
+        else:
+            for value in values:
+                self.add(value)
+
+    def _rebuild(self, values: List[Any]) -> None:
+        load = self._load
+        self._lists = [values[i:i + load] for i in range(0, len(values), load)]
+        self._maxes = [chunk[-1] for chunk in self._lists]
+        self._tree = []
+        self._len = len(values)
+
+    def _split(self, k: int) -> None:
+        chunk = self._lists[k]
+        half = chunk[self._load:]
+        del chunk[self._load:]
+        self._lists.insert(k + 1, half)
+        self._maxes[k] = chunk[-1]
+        self._maxes.insert(k + 1, half[-1])
+        self._tree = []
+
+    # ========
+    # Removal
+    # ========
+    def remove(self, value: Any) -> None:
+        """Remove one item equal to value, raises ValueError if there is none"""
+        k = bisect_left(self._maxes, value)
+        if k < len(self._maxes):
+            chunk = self._lists[k]
+            i = bisect_left(chunk, value)
+            if chunk[i] == value:
+                self._delete(k, i)
+                return
+        raise ValueError(f"{value!r} not in SortedList")
+
+    def discard(self, value: Any) -> None:
+        """Remove one item equal to value if there is one"""
+        try:
+            self.remove(value)
+        except ValueError:
+            pass
+
+    def pop(self, index: int = -1) -> Any:
+        """Remove and return the item at index"""
+        k, i = self._locate(self._normalize(index))
+        value = self._lists[k][i]
+        self._delete(k, i)
+        return value
+
+    def _delete(self, k: int, i: int) -> None:
+        chunk = self._lists[k]
+        del chunk[i]
+        self._len -= 1
+        self._tree_add(k, -1)
+        if not chunk:
+            del self._lists[k]
+            del self._maxes[k]
+            self._tree = []
+            return
+        self._maxes[k] = chunk[-1]
+        if len(chunk) < self._load // 2 and len(self._lists) > 1:
+            # Join the short chunk with a neighbour, splitting again if that got too long
+            j = k - 1 if k > 0 else k
+            self._lists[j].extend(self._lists[j + 1])
+            del self._lists[j + 1]
+            del self._maxes[j + 1]
+            self._maxes[j] = self._lists[j][-1]
+            self._tree = []
+            if len(self._lists[j]) > 2 * self._load:
+                self._split(j)
+
+    # ========
+    # Queries
+    # ========
+    def _normalize(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("SortedList index out of range")
+        return index
+
+    def __getitem__(self, index: int) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._len))]
+        k, i = self._locate(self._normalize(index))
+        return self._lists[k][i]
+
+    def bisect_left(self, value: Any) -> int:
+        """Index where value would be inserted before any equal items"""
+        k = bisect_left(self._maxes, value)
+        if k == len(self._maxes):
+            return self._len
+        return self._position(k, bisect_left(self._lists[k], value))
+
+    def bisect_right(self, value: Any) -> int:
+        """Index where value would be inserted after any equal items"""
+        k = bisect_right(self._maxes, value)
+        if k == len(self._maxes):
+            return self._len
+        return self._position(k, bisect_right(self._lists[k], value))
+
+    def index(self, value: Any) -> int:
+        """Index of the first item equal to value, raises ValueError if there is none"""
+        i = self.bisect_left(value)
+        if i == self._len or self[i] != value:
+            raise ValueError(f"{value!r} not in SortedList")
+        return i
+
+    def count(self, value: Any) -> int:
+        return self.bisect_right(value) - self.bisect_left(value)
+
+    def irange(self, minimum: Any = None, maximum: Any = None) -> Iterator[Any]:
+        """Items with minimum <= item <= maximum in order, None leaves that end open"""
+        if not self._lists:
+            return
+        k = 0 if minimum is None else bisect_left(self._maxes, minimum)
+        i = 0 if minimum is None or k == len(self._lists) else bisect_left(self._lists[k], minimum)
+        while k < len(self._lists):
+            chunk = self._lists[k]
+            if maximum is not None and not chunk[-1] <= maximum:
+                yield from chunk[i:bisect_right(chunk, maximum)]
+                return
+            yield from chunk[i:]
+            k += 1
+            i = 0
+
+# =========
+# Benchmark
+# =========
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mixed insert/query throughput of SortedList")
+    parser.add_argument("--size", type=lambda s: int(float(s)), default=10**6, help="Items loaded before the workload")
+    parser.add_argument("--ops", type=lambda s: int(float(s)), default=10**5, help="Operations in the mixed workload")
+    parser.add_argument("--batch", type=int, default=1000, help="Batch size for the re-sort baseline")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    initial = [rng.random() for _ in range(args.size)]
+    ops = [(rng.random(), rng.random()) for _ in range(args.ops)]
+
+    tic = time.perf_counter()
+    container = SortedList(initial)
+    print(f"SortedList bulk load of {args.size}: {time.perf_counter() - tic:0.6f} s")
+
+    # Half inserts, a quarter positional lookups and a quarter range queries
+    tic = time.perf_counter()
+    for kind, value in ops:
+        if kind < 0.5:
+            container.add(value)
+        elif kind < 0.75:
+            container[int(value * len(container))]
+        else:
+            container.bisect_right(value + 0.0001) - container.bisect_left(value)
+    elapsed = time.perf_counter() - tic
+    print(f"SortedList mixed workload: {args.ops / elapsed:0.0f} ops/s")
+
+    # Baseline: plain list, re-sorted after every batch of inserts
+    plain = sorted(initial)
+    pending = []
+    tic = time.perf_counter()
+    for kind, value in ops:
+        if kind < 0.5:
+            pending.append(value)
+            if len(pending) == args.batch:
+                plain = sorted(plain + pending)
+                pending = []
+        elif kind < 0.75:
+            plain[int(value * len(plain))]
+        else:
+            bisect_right(plain, value + 0.0001) - bisect_left(plain, value)
+    elapsed = time.perf_counter() - tic
+    print(f"list re-sorted every {args.batch} inserts: {args.ops / elapsed:0.0f} ops/s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
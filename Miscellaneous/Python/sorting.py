@@ -1,19 +1,92 @@
 # Sorting algorithms
 # ==================
-import timing
+import functools
+import inspect
+from bisect import bisect_left, bisect_right
 from random import randint
 from timeit import repeat
 
-def run_sorting_algorithm(algorithm, array):
-    setup_code = f"from __main__ import {algorithm}" \
-        if algorithm != "sorted" else ""
-    
-    stmt = f"{algorithm}({array})"
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def run_sorting_algorithm(algorithm, array, trials=3):
+    # Each trial sorts a fresh copy made in setup, so neither building the list
+    # nor re-sorting already sorted output ends up in the measurement.
+    # For a full size/shape grid use sort_bench.py
+    func = sorted if algorithm == "sorted" else globals()[algorithm]
 
-    times = repeat(setup=setup_code, stmt=stmt, repeat=3, number=10)
+    times = repeat(setup="data = array.copy()", stmt="func(data)",
+                   globals={"func": func, "array": array}, repeat=trials, number=1)
 
     print(f"Algorithm: {algorithm}. Minimum execution time: {min(times)}")
 
+# ========================
+# Key functions and reverse
+# ========================
+def keyed(sort):
+    # Adds key= and reverse= to a sorting function by decorate-sort-undecorate:
+    # key is called exactly once per item and the engine sorts (key, position, item) tuples.
+    # The position breaks ties, so items themselves are never compared and equal keys keep
+    # their input order. reverse=True keeps that order for equal keys too, like sorted(reverse=True).
+    # Without key or reverse the engine is called directly.
+    # Engines that other sorts (or they themselves) call are defined as _name and exposed as
+    # name = keyed(_name), so recursive and internal calls skip this wrapper; it takes the public name.
+    bounded = "lo" in inspect.signature(sort).parameters
+
+    @functools.wraps(sort)
+    def wrapper(array, *args, key=None, reverse=False, **kwargs):
+        if key is None and not reverse:
+            return sort(array, *args, **kwargs)
+        if reverse and bounded and (args or "lo" in kwargs or "hi" in kwargs):
+            raise TypeError("reverse=True sorts the whole list, it cannot be combined with lo/hi")
+
+        sign = -1 if reverse else 1
+        if key is None:
+            decorated = [(item, sign * i, item) for i, item in enumerate(array)]
+        else:
+            decorated = [(key(item), sign * i, item) for i, item in enumerate(array)]
+
+        result = sort(decorated, *args, **kwargs)
+        if reverse:
+            result.reverse()
+        undecorated = [entry[2] for entry in result]
+        if result is decorated:
+            # In-place engine, so sort the caller's list in place too
+            array[:] = undecorated
+            return array
+        return undecorated
+    wrapper.__name__ = wrapper.__qualname__ = sort.__name__.lstrip("_")
+    return wrapper
+
+def argsort(*columns, reverse=False):
+    # Row order that sorts parallel columns (lists, arrays or NumPy arrays of equal length)
+    # by columns[0], then columns[1] and so on, without building a tuple per row.
+    # reverse is one bool for every column or a sequence with one bool per column.
+    # Each column is one stable pass, starting from the least significant column (LSD order).
+    n = len(columns[0])
+    if any(len(column) != n for column in columns):
+        raise ValueError("All columns must have the same length")
+    flags = [reverse] * len(columns) if isinstance(reverse, bool) else list(reverse)
+
+    if np is not None and all(isinstance(column, np.ndarray) for column in columns):
+        order = np.arange(n)
+        for column, descending in reversed(list(zip(columns, flags))):
+            # Reversing before and after a stable ascending pass gives a stable descending pass
+            if descending:
+                order = order[::-1]
+            order = order[np.argsort(column[order], kind="stable")]
+            if descending:
+                order = order[::-1]
+        return order
+
+    order = list(range(n))
+    for column, descending in reversed(list(zip(columns, flags))):
+        order.sort(key=column.__getitem__, reverse=descending)
+    return order
+
+@keyed
 def bubble_sort(array):
     n = len(array)
 
@@ -31,14 +104,17 @@ def bubble_sort(array):
     
     return array
 
-def insertion_sort(array):
-    
-    for i in range(1, len(array)):
+def _insertion_sort(array, lo=0, hi=None):
+    # lo/hi (hi exclusive) restrict the sort to array[lo:hi], used as the small-slice cutoff of other sorts
+    if hi is None:
+        hi = len(array)
+
+    for i in range(lo + 1, hi):
         key_item = array[i]
 
         j = i - 1
 
-        while j >= 0 and array[j] > key_item:
+        while j >= lo and array[j] > key_item:
             array[j + 1] = array[j]
             j -= 1
         
@@ -46,6 +122,8 @@ def insertion_sort(array):
     
     return array
 
+insertion_sort = keyed(_insertion_sort)
+
 def merge(left, right):
 
     if len(left) == 0:
@@ -56,8 +134,10 @@ def merge(left, right):
 
     result = []
     index_left = index_right = 0
+    len_left, len_right = len(left), len(right)
 
-    while len(result) < len(left) + len(right):
+    # One side always runs out before result is full, the breaks below end the loop
+    while True:
         if left[index_left] <= right[index_right]:
             result.append(left[index_left])
             index_left += 1
@@ -65,25 +145,175 @@ def merge(left, right):
             result.append(right[index_right])
             index_right += 1
         
-        if index_right == len(right):
+        if index_right == len_right:
             result += left[index_left:]
             break
         
-        if index_left == len(left):
+        if index_left == len_left:
             result += right[index_right:]
             break
 
     return result
 
-def merge_sort(array):
+def _merge_sort(array):
     if len(array) < 2:
         return array
     
     midpoint = len(array) // 2
 
-    return merge(left=merge_sort(array[:midpoint]), right=merge_sort(array[midpoint:]))
+    return merge(left=_merge_sort(array[:midpoint]), right=_merge_sort(array[midpoint:]))
+
+merge_sort = keyed(_merge_sort)
+
+# ============================
+# Bottom-up natural merge sort
+# ============================
+MIN_RUN = 64    # Natural runs shorter than this are extended with binary insertion
+MIN_GALLOP = 7  # Wins in a row by one side before switching to galloping (block copies)
+
+def _extend_run(array, lo, start, hi):
+    # array[lo:start] is sorted, insert array[start:hi] into it one by one. bisect finds the place
+    # and the items after it move up with one slice assignment, so no Python loop shifts items.
+    # bisect_right puts an item after its equals, which keeps the sort stable.
+    for i in range(start, hi):
+        item = array[i]
+        pos = bisect_right(array, item, lo, i)
+        if pos < i:
+            array[pos + 1:i + 1] = array[pos:i]
+            array[pos] = item
+
+def find_runs(array):
+    # Split array into sorted runs, returns the run boundaries [0, end_1, end_2, ..., len(array)].
+    # Strictly descending runs are reversed in place (strict so equal items keep their order),
+    # short runs are extended to MIN_RUN items with _extend_run.
+    n = len(array)
+    bounds = [0]
+    lo = 0
+    while lo < n:
+        hi = lo + 1
+        if hi < n:
+            if array[hi] < array[lo]:
+                while hi + 1 < n and array[hi + 1] < array[hi]:
+                    hi += 1
+                hi += 1
+                array[lo:hi] = array[lo:hi][::-1]
+            else:
+                while hi + 1 < n and not array[hi + 1] < array[hi]:
+                    hi += 1
+                hi += 1
+        if hi - lo < MIN_RUN:
+            end = min(lo + MIN_RUN, n)
+            _extend_run(array, lo, hi, end)
+            hi = end
+        bounds.append(hi)
+        lo = hi
+    return bounds
+
+def merge_runs(array, lo, mid, hi):
+    # Stable in-place merge of the sorted runs array[lo:mid] and array[mid:hi].
+    # Left items not larger than the first right item are already in place, and so are right items
+    # not smaller than the last left item, bisect trims both. Only the rest of the left run is copied out,
+    # which is all the extra memory the sort needs. After the trim the right run always runs out first,
+    # so taking a left item needs no end check.
+    right, last = array[mid], array[mid - 1]
+    if not right < last:
+        # Runs are already in order, common for presorted input
+        return
+    lo = bisect_right(array, right, lo, mid)
+    hi = bisect_left(array, last, mid, hi)
+    left_run = array[lo:mid]
+    left = left_run[0]
+    i, j, k = 0, mid, lo
+    # The trim found that both ends move, which is likely in long blocks, so start by galloping
+    galloping = True
+    while True:
+        if galloping:
+            # Copy whole blocks found with bisect while a side keeps winning MIN_GALLOP times in a row
+            while True:
+                end = bisect_left(array, left, j, hi)
+                array[k:k + end - j] = array[j:end]
+                k += end - j
+                streak = end - j
+                j = end
+                if j == hi:
+                    array[k:hi] = left_run[i:]
+                    return
+                right = array[j]
+                end = bisect_right(left_run, right, i)
+                array[k:k + end - i] = left_run[i:end]
+                k += end - i
+                streak = max(streak, end - i)
+                i = end
+                left = left_run[i]
+                if streak < MIN_GALLOP:
+                    break
+            galloping = False
+        # One item at a time, a side at a time. Here right < left is known, so the right item is taken
+        # without comparing, and when the loop of a side ends the other side's item is taken the same way.
+        # No win counters: the second win in a row looks MIN_GALLOP items ahead once, and only a win
+        # there too switches to galloping.
+        array[k] = right
+        k += 1
+        j += 1
+        if j == hi:
+            break
+        right = array[j]
+        if right < left:
+            if j + MIN_GALLOP < hi and array[j + MIN_GALLOP] < left:
+                galloping = True
+                continue
+            while right < left:
+                array[k] = right
+                k += 1
+                j += 1
+                if j == hi:
+                    array[k:hi] = left_run[i:]
+                    return
+                right = array[j]
+        array[k] = left
+        k += 1
+        i += 1
+        left = left_run[i]
+        if not right < left:
+            ahead = i + MIN_GALLOP
+            if ahead < len(left_run) and not right < left_run[ahead]:
+                # The left block ends somewhere after 'ahead', after it right < left again
+                end = bisect_right(left_run, right, ahead + 1)
+                array[k:k + end - i] = left_run[i:end]
+                k += end - i
+                i = end
+                left = left_run[i]
+                continue
+            while not right < left:
+                array[k] = left
+                k += 1
+                i += 1
+                left = left_run[i]
+    # Whatever is left of the left run goes after the last right item
+    array[k:hi] = left_run[i:]
+
+@keyed
+def bottom_up_merge_sort(array):
+    # Stable in-place merge sort that gives the same result as merge_sort.
+    # Natural runs are found first (so presorted input is close to O(n)), then merged pairwise
+    # bottom-up in place; each merge only copies out the part of its left run that has to move.
+    n = len(array)
+    if n < 2:
+        return array
+
+    bounds = find_runs(array)
+    while len(bounds) > 2:
+        merged = [0]
+        for r in range(0, len(bounds) - 2, 2):
+            merge_runs(array, bounds[r], bounds[r + 1], bounds[r + 2])
+            merged.append(bounds[r + 2])
+        if len(bounds) % 2 == 0:
+            # Odd number of runs, the last one has no partner this pass
+            merged.append(n)
+        bounds = merged
+    return array
 
-def quicksort(array):
+def _quicksort(array):
     if len(array) < 2:
         return array
     
@@ -100,20 +330,150 @@ def quicksort(array):
         elif item > pivot:
             high.append(item)
     
-    return quicksort(low) + same + quicksort(high)
+    return _quicksort(low) + same + _quicksort(high)
+
+quicksort = keyed(_quicksort)
+
+# ==========================
+# In-place quicksort engine
+# ==========================
+INSERTION_CUTOFF = 16  # Slices shorter than this are finished with insertion_sort
+NINTHER_CUTOFF = 128   # Slices at least this long pick the pivot with Tukey's ninther
+
+def median_of_three(array, a, b, c):
+    x, y, z = array[a], array[b], array[c]
+    if x < y:
+        if y < z:
+            return y
+        return z if x < z else x
+    if x < z:
+        return x
+    return z if y < z else y
+
+def choose_pivot(array, lo, hi):
+    # Median of first/middle/last, or the median of three such medians on long slices
+    last = hi - 1
+    mid = (lo + last) // 2
+    if hi - lo < NINTHER_CUTOFF:
+        return median_of_three(array, lo, mid, last)
+    step = (hi - lo) // 8
+    a = median_of_three(array, lo, lo + step, lo + 2 * step)
+    b = median_of_three(array, mid - step, mid, mid + step)
+    c = median_of_three(array, last - 2 * step, last - step, last)
+    if a < b:
+        if b < c:
+            return b
+        return c if a < c else a
+    if a < c:
+        return a
+    return c if b < c else b
+
+def partition3(array, lo, hi, pivot):
+    # Three-way partition of array[lo:hi] around pivot (Bentley-McIlroy).
+    # Scans from both ends like Hoare's partition so each misplaced pair costs one swap,
+    # items equal to pivot are parked at the two ends and swapped into the middle at the end.
+    # Afterwards array[lo:lt] < pivot, array[lt:gt] == pivot and array[gt:hi] > pivot
+    i, j = lo, hi - 1
+    p, q = lo, hi - 1  # array[lo:p] and array[q+1:hi] hold items equal to pivot
+    while True:
+        while i <= j:
+            item = array[i]
+            if pivot < item:
+                break
+            if not item < pivot:
+                array[i] = array[p]
+                array[p] = item
+                p += 1
+            i += 1
+        while i <= j:
+            item = array[j]
+            if item < pivot:
+                break
+            if not pivot < item:
+                array[j] = array[q]
+                array[q] = item
+                q -= 1
+            j -= 1
+        if i > j:
+            break
+        array[i], array[j] = array[j], array[i]
+        i += 1
+        j -= 1
+
+    # Move the parked equal items from both ends next to each other in the middle
+    m = min(p - lo, i - p)
+    if m:
+        array[lo:lo + m], array[i - m:i] = array[i - m:i], array[lo:lo + m]
+    m = min(hi - 1 - q, q - j)
+    if m:
+        array[j + 1:j + 1 + m], array[hi - m:hi] = array[hi - m:hi], array[j + 1:j + 1 + m]
+    return lo + (i - p), hi - (q - j)
+
+def _heapsort(array, lo=0, hi=None):
+    # In-place heapsort of array[lo:hi], the fallback when quicksort recurses too deep
+    if hi is None:
+        hi = len(array)
+    n = hi - lo
+
+    def sift_down(root, end):
+        item = array[lo + root]
+        child = 2 * root + 1
+        while child < end:
+            if child + 1 < end and array[lo + child] < array[lo + child + 1]:
+                child += 1
+            if not item < array[lo + child]:
+                break
+            array[lo + root] = array[lo + child]
+            root = child
+            child = 2 * root + 1
+        array[lo + root] = item
+
+    for start in range(n // 2 - 1, -1, -1):
+        sift_down(start, n)
+    for end in range(n - 1, 0, -1):
+        array[lo], array[lo + end] = array[lo + end], array[lo]
+        sift_down(0, end)
+    return array
+
+heapsort = keyed(_heapsort)
+
+def _introsort(array, lo=0, hi=None, depth_limit=None):
+    # In-place replacement for quicksort: three-way partitioning so duplicates are not recursed into,
+    # insertion_sort for short slices and heapsort once the depth limit is hit (O(n log n) worst case).
+    # Recursion only goes into the smaller side, the larger side is handled by the loop,
+    # so the stack never grows past O(log n).
+    if hi is None:
+        hi = len(array)
+    if depth_limit is None:
+        depth_limit = 2 * max(hi - lo, 1).bit_length()
+
+    while hi - lo > INSERTION_CUTOFF:
+        if depth_limit == 0:
+            _heapsort(array, lo, hi)
+            return array
+        depth_limit -= 1
+
+        lt, gt = partition3(array, lo, hi, choose_pivot(array, lo, hi))
+
+        if lt - lo < hi - gt:
+            _introsort(array, lo, lt, depth_limit)
+            lo = gt
+        else:
+            _introsort(array, gt, hi, depth_limit)
+            hi = lt
+
+    _insertion_sort(array, lo, hi)
+    return array
+
+introsort = keyed(_introsort)
 
 if __name__ == "__main__":
     ARRAY_LENGTH = 1000
     rand_arr = [randint(0, 1000) for i in range(ARRAY_LENGTH)]
 
-    
-
-    print(timing.timer(bubble_sort, rand_arr.copy()))
-    print(timing.timer(insertion_sort, rand_arr.copy()))
-    print(timing.timer(merge_sort, rand_arr.copy()))
-    print(timing.timer(quicksort, rand_arr.copy()))
 
     run_sorting_algorithm(algorithm="bubble_sort", array=rand_arr)
     run_sorting_algorithm(algorithm="insertion_sort", array=rand_arr)
     run_sorting_algorithm(algorithm="merge_sort", array=rand_arr)
-    run_sorting_algorithm(algorithm="quicksort", array=rand_arr)
\ No newline at end of file
+    run_sorting_algorithm(algorithm="quicksort", array=rand_arr)
+    run_sorting_algorithm(algorithm="sorted", array=rand_arr)
@@ -2,7 +2,12 @@ import time
 from dataclasses import dataclass, field
 from typing import Any, Callable, ClassVar, Dict, Optional
 import functools
+import inspect
+import itertools
 from contextlib import ContextDecorator
+from contextvars import ContextVar
+from Timer import Timer_clocks
+from Timer.Timer_registry import Registry, registry
 
 class TimerError(Exception):
     """Custom exception to report errors"""
@@ -55,41 +60,77 @@ class Timer:
 """Timer is made into a dataclass using the @dataclass decorator.
    To use a data class, variables must be annotated. This allows type hints to be added.
    If you do not want to use type hints you can annotate all variables with 'Any'"""
+# Start times of the TimerDCs running in the current thread/task, keyed by TimerDC._key.
+# One ContextVar for every instance (a ContextVar can't be removed from a context once set),
+# start() and stop() replace the dict rather than changing it.
+_running: ContextVar[Dict[int, Any]] = ContextVar("TimerDC_running", default={})
+_keys = itertools.count()
+
 @dataclass
 class TimerDC(ContextDecorator):
-    timers: ClassVar[Dict[str, float]] = dict() # ClassVar annotation tells data classes that .timers is a class variable, dictionary of timers
+    timers: ClassVar[Registry] = registry       # ClassVar annotation tells data classes that .timers is a class variable, shared registry of named timers (Timer/Timer_registry.py)
     name: Optional[str] = None                  # Attribute on TimerDC, can be defined when creating Timer instance, default is None
     text: str = "Elapsed time: {:0.6f} seconds" # Attribute on TimerDC
     logger: Optional[Callable[[str], None]] = print # Attribute on TimerDC
-    _start_time: Optional[float] = field(default=None, init=False, repr=False) # dataclasses.field() says that start time should be removed from .__init__() and the repr of Timer, we want it hidden
+    sink: Optional[Any] = None                  # Timer/Timer_sink.py LogSink, gets raw (name, ns) records instead of logger formatting them here
+    spans: Optional[Any] = None                 # Timer/Timer_trace.py TraceSink, gets a begin/end event of every run for a timeline
+    clocks: bool = False                        # Also measure process CPU, thread CPU and wait time (Timer/Timer_clocks.py)
+    last_clocks: Optional[Timer_clocks.ClockSample] = field(default=None, init=False, repr=False) # Breakdown of the last stop() when clocks is True
+    _key: int = field(default_factory=_keys.__next__, init=False, repr=False, compare=False) # dataclasses.field() says that the key should be removed from .__init__() and the repr of Timer, we want it hidden
 
     # .__post_init__() is used for any initialization that is not apart of setting instance attributes
     # here we use it to add named timers to .timers
     def __post_init__(self) -> None:
-        """Add timer to dict of timers after initialization"""
+        """Add timer to the registry of timers after initialization"""
         if self.name:
             self.timers.setdefault(self.name, 0)
     
     def start(self) -> None:
         """Start a new timer"""
-        if self._start_time is not None:
+        # The start time lives in _running, so every thread and every asyncio task
+        # using this one instance has its own start time and they don't trip over each other
+        running = _running.get()
+        if self._key in running:
             raise TimerError(f"Timer is running. Use .stop() to stop it")
-        self._start_time = time.perf_counter()
+        # In clocks mode the start is a (process, thread, wall) tuple of ns readings,
+        # next to it whether a span was begun (a full TraceSink drops it)
+        span = self.spans is not None and self.spans.begin(self.name or "TimerDC")
+        _running.set({**running, self._key: (Timer_clocks.read() if self.clocks else time.perf_counter(), span)})
 
     def stop(self) -> float:
         """Stop the timer, and report the elapsed time"""
-        if self._start_time is None:
+        running = _running.get()
+        entry = running.get(self._key)
+        if entry is None:
             raise TimerError(f"Timer is not running. Use .start() to start it")
+        start_time, span = entry
         
         # Calculate elapsed time
-        elapsed_time = time.perf_counter() - self._start_time
-        self._start_time = None
+        sample = None
+        if self.clocks:
+            sample = self.last_clocks = Timer_clocks.ClockSample.since(start_time)
+            elapsed_time = sample.wall_ns / 1e9
+        else:
+            elapsed_time = time.perf_counter() - start_time
+        if span:
+            self.spans.end(self.name or "TimerDC")
+        _running.set({key: value for key, value in running.items() if key != self._key})
         
         # Report elapsed time
-        if self.logger:
-            self.logger(self.text.format(elapsed_time))
+        if self.sink is not None:
+            self.sink.record(self.name or self.text, round(elapsed_time * 1e9), None if self.name else self.text)
+        elif self.logger:
+            if sample is not None:
+                self.logger(f"{self.text.format(elapsed_time)} ({sample})")
+            else:
+                self.logger(self.text.format(elapsed_time))
         if self.name:
-            self.timers[self.name] += elapsed_time
+            # Count, total and max per name, recorded without a lock
+            self.timers.add(self.name, elapsed_time)
+            if sample is not None:
+                self.timers.add(f"{self.name}.process_cpu", sample.process_ns / 1e9)
+                self.timers.add(f"{self.name}.thread_cpu", sample.thread_ns / 1e9)
+                self.timers.add(f"{self.name}.wait", sample.wait_ns / 1e9)
         
         return elapsed_time
     
@@ -126,6 +167,14 @@ class TimerDC(ContextDecorator):
     def __exit__(self, *exc_info: Any) -> None:
         """Stop the context manager timer"""
         self.stop()
+
+    # 'async with TimerDC():' works the same way, the time includes everything awaited in the block
+    async def __aenter__(self) -> "TimerDC":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.stop()
     
     # Now to use Timer() as a context manager:
     # with Timer():
@@ -155,6 +204,19 @@ class TimerDC(ContextDecorator):
             
             return wrapper_timer """
 
+    # ContextDecorator only knows about regular functions: decorating an 'async def' with it
+    # would only time creating the coroutine. Coroutine functions get a wrapper that awaits instead.
+    def __call__(self, func):
+        if not inspect.iscoroutinefunction(func):
+            return super().__call__(func)
+
+        @functools.wraps(func)
+        async def wrapper_timer(*args, **kwargs):
+            async with self:
+                return await func(*args, **kwargs)
+
+        return wrapper_timer
+
 # ========================
 # Basic Decorator Template
 # ========================